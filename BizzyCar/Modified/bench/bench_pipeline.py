@@ -0,0 +1,215 @@
+"""Throughput / latency benchmark for the extraction pipeline.
+
+Drives ``process_notes``, the streaming CLI path and ``/analyze`` (in-process
+over httpx's ASGI transport) with a simulated model client, across batch sizes
+and concurrency levels, and writes a JSON report that can be diffed between
+commits.
+
+Run from BizzyCar/Modified:
+    python -m bench.bench_pipeline --output bench/results.json
+    python -m bench.bench_pipeline --quick --compare bench/results.json
+"""
+import argparse, asyncio, json, os, platform, random, statistics, subprocess, tempfile, time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+import src.processing as processing
+from src.cache import reset_cache
+from src.ratelimit import reset_rate_limiters
+from src.resilience import reset_resilience
+from src.main import _run_cli_stream, app
+from .sim_client import DEFAULT_PROFILE, SimulatedLLMClient
+
+VEHICLES = ["2018 Camry", "2015 Accord", "2020 Rogue", "2019 F-150", "Camry", "my car", "the truck"]
+SERVICES = ["oil change", "brake grinding", "tire rotation", "tire pressure light", "battery dead",
+            "check engine light on", "A/C not cooling", "wants a quote", "annual inspection"]
+FILLER = ("customer called back about the appointment, mileage 45210, prefers mornings, "
+          "waiting room ok, part number 8812-2231 on order, advised of shop fees, ").split(" ")
+
+def make_notes(n: int, seed: int, dup_rate: float = 0.15, long_rate: float = 0.2) -> List[str]:
+    """Synthetic dealer notes: short templated ones, long pasted ones, some exact duplicates."""
+    rng = random.Random(seed)
+    notes: List[str] = []
+    for _ in range(n):
+        if notes and rng.random() < dup_rate:
+            notes.append(rng.choice(notes))
+            continue
+        services = " and ".join(rng.sample(SERVICES, rng.choice([1, 1, 2, 3])))
+        note = f"{rng.choice(VEHICLES)} in for {services}."
+        if rng.random() < long_rate:
+            note += " " + " ".join(rng.choice(FILLER) for _ in range(rng.randint(50, 300)))
+        notes.append(note[:2500])
+    return notes
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return round(values[0], 2)
+    return round(statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1], 2)
+
+class Recorder:
+    """Stands in for ``processing.log_event`` and wraps the per-note / packed-call
+    functions to derive per-note latency, retries and routing from one run.
+
+    A note's latency is the time spent in ``_process_one`` plus, for notes
+    answered by a packed prompt, the duration of that packed request.
+    """
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.counts: Dict[str, int] = {}
+        self.methods: Dict[str, int] = {}
+        self.batch_ms: Dict[str, float] = {}
+
+    def __call__(self, event_type: str, data: Dict[str, Any], error: Optional[str] = None):
+        self.counts[event_type] = self.counts.get(event_type, 0) + 1
+        if event_type == "extraction_complete":
+            self.methods[data["method"]] = self.methods.get(data["method"], 0) + 1
+
+    def wrap_extract_batch(self, fn):
+        async def timed(texts):
+            t0 = time.perf_counter()
+            out = await fn(texts)
+            ms = (time.perf_counter() - t0) * 1000.0
+            for t in texts:
+                self.batch_ms[t] = ms
+            return out
+        return timed
+
+    def wrap_process_one(self, fn):
+        async def timed(idx, text, prefetched=None):
+            t0 = time.perf_counter()
+            out = await fn(idx, text, prefetched)
+            ms = (time.perf_counter() - t0) * 1000.0
+            if prefetched is not None:
+                ms += self.batch_ms.get(processing.redact(text.strip()[:2000]), 0.0)
+            self.latencies.append(ms)
+            return out
+        return timed
+
+async def _drive(mode: str, notes: List[str], concurrency: int, batch_size: int) -> None:
+    if mode == "process_notes":
+        await processing.process_notes(notes, concurrency=concurrency, batch_size=batch_size)
+    elif mode == "cli":
+        with tempfile.TemporaryDirectory() as d:
+            src, out = os.path.join(d, "in.jsonl"), os.path.join(d, "out.jsonl")
+            with open(src, "w") as f:
+                f.writelines(json.dumps(n) + "\n" for n in notes)
+            await _run_cli_stream(src, out, concurrency, batch_size, resume=False)
+    elif mode == "api":
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            r = await c.post("/analyze", json={"messages": notes, "concurrency": concurrency,
+                                               "batch_size": batch_size})
+            r.raise_for_status()
+    else:
+        raise ValueError(f"unknown mode {mode!r}")
+
+def run_case(mode: str, n: int, concurrency: int, batch_size: int,
+             profile: Dict[str, float], seed: int) -> Dict[str, Any]:
+    notes = make_notes(n, seed)
+    client = SimulatedLLMClient(profile, seed=seed)
+    recorder = Recorder()
+
+    async def get_sim_client():
+        return client
+
+    names = ("get_client", "log_event", "extract_batch", "_process_one")
+    saved = [getattr(processing, name) for name in names]
+    processing.get_client = get_sim_client
+    processing.log_event = recorder
+    processing.extract_batch = recorder.wrap_extract_batch(processing.extract_batch)
+    processing._process_one = recorder.wrap_process_one(processing._process_one)
+    reset_cache(); reset_resilience(); reset_rate_limiters()
+    try:
+        t0 = time.perf_counter()
+        asyncio.run(_drive(mode, notes, concurrency, batch_size))
+        wall = time.perf_counter() - t0
+    finally:
+        for name, fn in zip(names, saved):
+            setattr(processing, name, fn)
+        reset_cache(); reset_resilience(); reset_rate_limiters()
+
+    done = max(sum(recorder.methods.values()), 1)
+    return {
+        "mode": mode, "notes": n, "concurrency": concurrency, "batch_size": batch_size,
+        "wall_s": round(wall, 4),
+        "notes_per_s": round(n / wall, 2),
+        "p50_ms": percentile(recorder.latencies, 50),
+        "p95_ms": percentile(recorder.latencies, 95),
+        "p99_ms": percentile(recorder.latencies, 99),
+        "model_requests": client.requests,
+        "model_requests_per_note": round(client.requests / n, 3),
+        "retries_per_note": round(recorder.counts.get("model_retry", 0) / n, 3),
+        "json_repaired": recorder.counts.get("json_repaired", 0),
+        "fallback_rate": round(recorder.methods.get("fallback", 0) / done, 3),
+        "rules_rate": round(recorder.methods.get("rules", 0) / done, 3),
+    }
+
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {(r["mode"], r["notes"], r["concurrency"], r["batch_size"]): r
+                    for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}:")
+    for r in current:
+        b = baseline.get((r["mode"], r["notes"], r["concurrency"], r["batch_size"]))
+        if b is None:
+            continue
+        d_tput = (r["notes_per_s"] / b["notes_per_s"] - 1) * 100 if b["notes_per_s"] else 0.0
+        d_p95 = (r["p95_ms"] / b["p95_ms"] - 1) * 100 if b.get("p95_ms") and r.get("p95_ms") else 0.0
+        print(f"  {r['mode']:<13} n={r['notes']:<5} c={r['concurrency']:<3} b={r['batch_size']:<3} "
+              f"notes/s {d_tput:+6.1f}%  p95 {d_p95:+6.1f}%")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="process_notes,cli,api")
+    parser.add_argument("--sizes", default="50,200")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--batch-sizes", default="1,8")
+    parser.add_argument("--profile", help="JSON object overriding the simulated latency/error profile")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--quick", action="store_true", help="Small smoke run (process_notes, 50 notes)")
+    parser.add_argument("--output", default="bench/results.json")
+    parser.add_argument("--compare", help="Earlier results file to diff against")
+    args = parser.parse_args()
+
+    modes = ["process_notes"] if args.quick else args.modes.split(",")
+    sizes = [50] if args.quick else [int(x) for x in args.sizes.split(",")]
+    concurrency = [int(x) for x in args.concurrency.split(",")]
+    batch_sizes = [int(x) for x in args.batch_sizes.split(",")]
+    profile = {**DEFAULT_PROFILE, **(json.loads(args.profile) if args.profile else {})}
+
+    results = []
+    for mode in modes:
+        for n in sizes:
+            for c in concurrency:
+                for b in batch_sizes:
+                    r = run_case(mode, n, c, b, profile, args.seed)
+                    results.append(r)
+                    print(f"{mode:<13} n={n:<5} c={c:<3} b={b:<3} {r['notes_per_s']:9.1f} notes/s  "
+                          f"p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  p99 {r['p99_ms']:7.1f} ms  "
+                          f"req/note {r['model_requests_per_note']:.2f}  retry/note {r['retries_per_note']:.2f}  "
+                          f"fallback {r['fallback_rate']:.2f}")
+
+    report = {
+        "meta": {"git_rev": git_rev(), "python": platform.python_version(),
+                 "created": datetime.utcnow().isoformat(), "seed": args.seed, "profile": profile},
+        "results": results,
+    }
+    if args.compare:
+        compare(results, args.compare)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
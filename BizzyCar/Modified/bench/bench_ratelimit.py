@@ -0,0 +1,84 @@
+"""Sustained throughput against a quota-enforcing provider, with and without the
+AIMD rate-limit controller.
+
+Drives ``process_notes`` through the real OpenAI SDK client against
+``bench.stub_llm`` (in-process over httpx's ASGI transport). ``sdk`` is the
+previous behaviour: the SDK's own retries, then fallback. ``aimd`` routes
+calls through ``src.ratelimit``.
+
+Run from BizzyCar/Modified:
+    python -m bench.bench_ratelimit --notes 400 --concurrency 32 --rps 40 --provider-concurrency 8
+"""
+import argparse, asyncio, os, time
+from typing import Any, Dict
+
+import httpx
+
+import src.processing as processing
+from src.cache import reset_cache
+from src.model_client import RealAPIClient
+from src.ratelimit import reset_rate_limiters
+from src.resilience import reset_resilience
+from .stub_llm import make_app
+
+MODEL = "stub-model"
+
+def run_case(mode: str, notes: int, concurrency: int, rps: float, provider_concurrency: int,
+             latency_ms: float, overload_rate: float) -> Dict[str, Any]:
+    os.environ["RATE_LIMIT_ENABLED"] = "true" if mode == "aimd" else "false"
+    reset_rate_limiters(); reset_resilience(); reset_cache()
+    stub = make_app(rps=rps, concurrency=provider_concurrency, latency_ms=latency_ms,
+                    overload_rate=overload_rate)
+    texts = [f"customer {i} says the car makes a noise on cold mornings" for i in range(notes)]
+
+    async def drive():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub")
+        client = RealAPIClient("stub-key", "http://stub/v1", MODEL, http_client=http)
+
+        async def get_stub_client():
+            return client
+
+        saved = processing.get_client, processing.log_event
+        processing.get_client, processing.log_event = get_stub_client, lambda *a, **k: None
+        try:
+            t0 = time.perf_counter()
+            out = await processing.process_notes(texts, concurrency=concurrency)
+            return out, time.perf_counter() - t0, client.limiter
+        finally:
+            processing.get_client, processing.log_event = saved
+            await client.aclose()
+
+    out, wall, limiter = asyncio.run(drive())
+    model = sum(r["_extraction_method"] == "model" for r in out)
+    row = {"mode": mode, "notes": notes, "wall_s": round(wall, 2),
+           "model_notes_per_s": round(model / wall, 1), "model": model, "fallback": notes - model,
+           **{f"provider_{k}": v for k, v in stub.state.counts.items()}}
+    if limiter is not None:
+        row.update(limiter.status())
+    reset_rate_limiters(); reset_resilience(); reset_cache()
+    return row
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="sdk,aimd")
+    parser.add_argument("--notes", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32, help="process_notes concurrency")
+    parser.add_argument("--rps", type=float, default=40.0, help="Provider quota, requests/s")
+    parser.add_argument("--provider-concurrency", type=int, default=8, help="Provider in-flight quota")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--overload-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    saved = os.environ.get("RATE_LIMIT_ENABLED")
+    try:
+        for mode in args.modes.split(","):
+            row = run_case(mode, args.notes, args.concurrency, args.rps, args.provider_concurrency,
+                           args.latency_ms, args.overload_rate)
+            print("  ".join(f"{k}={v}" for k, v in row.items()))
+    finally:
+        if saved is None:
+            os.environ.pop("RATE_LIMIT_ENABLED", None)
+        else:
+            os.environ["RATE_LIMIT_ENABLED"] = saved
+
+if __name__ == "__main__":
+    main()
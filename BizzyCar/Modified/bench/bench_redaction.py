@@ -0,0 +1,41 @@
+"""Compare single-pass PII redaction against the two ``re.sub`` passes it replaced.
+
+Run from BizzyCar/Modified:  python -m bench.bench_redaction
+"""
+import re, timeit
+from src.redaction import redact
+from .bench_pipeline import make_notes
+
+PII_EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PII_PHONE = re.compile(r"\+?\d[\d\-\s]{7,}\d")
+
+def legacy(text: str) -> str:
+    text = PII_EMAIL.sub("<redacted_email>", text)
+    return PII_PHONE.sub("<redacted_phone>", text)
+
+# 2000-char inputs that make the old email pattern retry from every start position.
+ADVERSARIAL = {
+    "pasted VIN/part table": ("1HGCM82633A004352" * 120)[:2000],
+    "dash ruler": "12345678" + "-" * 1992,
+    "digit/space run": "1 " * 1000,
+    "dotted domain": "a@" + "." * 1998,
+    "dotted labels": "a@" + "a." * 999,
+    "many contacts": ("call 555-123-4567 or j.doe@example.com. " * 50)[:2000],
+}
+
+def per_call_us(fn, text: str, number: int) -> float:
+    return min(timeit.repeat(lambda: fn(text), number=number, repeat=3)) / number * 1e6
+
+def main() -> None:
+    print(f"{'input (2000 chars)':<24} {'two re.sub':>12} {'single pass':>12}")
+    for name, text in ADVERSARIAL.items():
+        assert redact(text) == legacy(text), name
+        print(f"{name:<24} {per_call_us(legacy, text, 20):9.1f} us {per_call_us(redact, text, 20):9.1f} us")
+    notes = make_notes(2000, seed=1)
+    assert [redact(t) for t in notes] == [legacy(t) for t in notes]
+    old = min(timeit.repeat(lambda: [legacy(t) for t in notes], number=1, repeat=3)) / len(notes) * 1e6
+    new = min(timeit.repeat(lambda: [redact(t) for t in notes], number=1, repeat=3)) / len(notes) * 1e6
+    print(f"{'typical notes':<24} {old:9.1f} us {new:9.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-note CPU for result validation and serialization, measured separately.
+
+validate:  what ``_process_one`` pays per note. ``single`` is
+           validate_extraction + model_dump (the per-note path, including
+           every note when batch_size is 1). ``packed`` is one
+           validate_extractions call per packed response (as in
+           extract_batch), then ``_process_one`` validating the dumps again.
+serialize: writing the same results as a CLI file and an API body. ``before``
+           is ``json.dump(indent=2)`` plus jsonable_encoder + ``json.dumps``.
+           ``after`` is pydantic-core straight to bytes (``jsonparse.dumps``).
+
+Validation is ~6-9 us/note on the single path and costs more, not less, on the
+packed path (packing saves model calls, not CPU); the win is in serialization.
+
+Run from BizzyCar/Modified:
+    python -m bench.profile_validation --sizes 10000,100000
+    python -m bench.profile_validation --sizes 10000 --cprofile serialize_before
+"""
+import argparse, cProfile, io, json, pstats, random, time
+from typing import Any, Callable, Dict, List
+from fastapi.encoders import jsonable_encoder
+from src.jsonparse import dumps
+from src.validators import validate_extraction, validate_extractions
+
+INTENTS = ["oil_change", "brake_service", "tire_rotation", "battery", "engine_diagnostic", "unknown"]
+
+def make_extractions(n: int, seed: int = 3) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{"vin_detected": rng.random() < 0.1, "vehicle_make": rng.choice(["Toyota", "Honda", None]),
+             "vehicle_model": rng.choice(["Camry", "Accord", None]), "year": rng.choice([2015, 2018, None]),
+             "service_intent": rng.sample(INTENTS, rng.randint(1, 2)), "urgency": "medium",
+             "raw_extraction_confidence": round(rng.uniform(0.45, 0.95), 2), "notes": None}
+            for _ in range(n)]
+
+def _result(ex) -> Dict[str, Any]:
+    result = ex.model_dump()
+    result["_extraction_method"] = "model"
+    return result
+
+def validate_single(objs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [_result(validate_extraction(obj)[0]) for obj in objs]
+
+def validate_packed(objs: List[Dict[str, Any]], batch_size: int = 8) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(0, len(objs), batch_size):
+        dumped = [ex.model_dump() for ex, _ in validate_extractions(objs[i:i + batch_size])]
+        out.extend(_result(validate_extraction(obj)[0]) for obj in dumped)
+    return out
+
+def serialize_before(results: List[Dict[str, Any]]) -> None:
+    json.dump({"items": results}, io.StringIO(), indent=2)
+    json.dumps(jsonable_encoder({"items": results}))
+
+def serialize_after(results: List[Dict[str, Any]]) -> None:
+    dumps({"items": results}, indent=2)
+    dumps({"items": results})
+
+CASES = {"validate_single": validate_single, "validate_packed": validate_packed,
+         "serialize_before": serialize_before, "serialize_after": serialize_after}
+
+def cpu_us_per_note(fn: Callable, objs: List[Dict[str, Any]], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.process_time()
+        fn(objs)
+        best = min(best, time.process_time() - t0)
+    return best / len(objs) * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,50000,100000")
+    parser.add_argument("--cprofile", choices=list(CASES), help="Print the hottest functions of one case")
+    args = parser.parse_args()
+    for n in (int(x) for x in args.sizes.split(",")):
+        objs = make_extractions(n)
+        results = validate_single(objs)
+        if args.cprofile:
+            prof = cProfile.Profile()
+            prof.runcall(CASES[args.cprofile], results if args.cprofile.startswith("serialize") else objs)
+            pstats.Stats(prof).sort_stats("tottime").print_stats(12)
+            continue
+        single, packed = cpu_us_per_note(validate_single, objs), cpu_us_per_note(validate_packed, objs)
+        old, new = cpu_us_per_note(serialize_before, results), cpu_us_per_note(serialize_after, results)
+        print(f"{n:>7} notes  validate single {single:5.1f} packed {packed:5.1f} us/note  "
+              f"serialize before {old:5.1f} after {new:5.1f} us/note ({old / new:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Mock model client with realistic, configurable latency and failure behaviour."""
+import asyncio, json, math, random
+from typing import Any, Dict, List
+from src.model_client import MockLLMClient
+
+DEFAULT_PROFILE: Dict[str, float] = {
+    "latency_median_ms": 40.0,   # lognormal median per request
+    "latency_sigma": 0.5,        # lognormal shape; 0.5 gives p99 ~3.2x median
+    "per_item_ms": 8.0,          # extra latency per note in a packed batch request
+    "error_rate": 0.02,          # provider error -> generic exception -> fallback
+    "truncate_rate": 0.10,       # drop the closing brace (repairable)
+    "garbage_rate": 0.05,        # non-JSON reply (forces a retry)
+}
+
+class SimulatedLLMClient(MockLLMClient):
+    """``MockLLMClient`` content with sampled latency, errors and malformed replies.
+
+    All randomness beyond the mock's own extraction heuristics comes from a
+    private seeded RNG so runs are reproducible.
+    """
+    def __init__(self, profile: Dict[str, float], seed: int = 0):
+        super().__init__()
+        self.bad_json_rate = 0.0  # replaced by truncate_rate / garbage_rate below
+        self.profile = {**DEFAULT_PROFILE, **profile}
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.items_requested = 0
+
+    def _latency(self, items: int) -> float:
+        p = self.profile
+        mu = math.log(max(p["latency_median_ms"], 1e-3))
+        ms = self.rng.lognormvariate(mu, p["latency_sigma"]) + p["per_item_ms"] * (items - 1)
+        return ms / 1000.0
+
+    def _corrupt(self, payload: str) -> str:
+        r = self.rng.random()
+        if r < self.profile["garbage_rate"]:
+            return "I'm sorry, I can't help with that."
+        if r < self.profile["garbage_rate"] + self.profile["truncate_rate"]:
+            return payload[:-1]
+        return payload
+
+    async def _respond(self, payload: str, items: int) -> str:
+        self.requests += 1
+        self.items_requested += items
+        await asyncio.sleep(self._latency(items))
+        if self.rng.random() < self.profile["error_rate"]:
+            raise Exception(" AI API error: simulated 503")
+        return self._corrupt(payload)
+
+    async def extract(self, text: str) -> str:
+        return await self._respond(json.dumps(self._extract_obj(text)), 1)
+
+    async def extract_batch(self, texts: List[str]) -> str:
+        items: List[Dict[str, Any]] = [{"index": i, **self._extract_obj(t)} for i, t in enumerate(texts)]
+        return await self._respond(json.dumps(items), len(texts))
@@ -0,0 +1,65 @@
+"""Local OpenAI-compatible stub that enforces a provider-style quota.
+
+``POST /v1/chat/completions`` answers with a rules-based extraction after
+``latency_ms``; calls beyond ``concurrency`` in flight or ``rps`` requests per
+second get a 429 with ``Retry-After`` / ``retry-after-ms``, and ``overload_rate``
+of the rest a 529 "overloaded". Mount it in-process with httpx's ASGI
+transport, or serve it:
+
+    uvicorn bench.stub_llm:app --port 8901
+"""
+import asyncio, json, math, random, time
+from typing import Any, Dict
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from src.matcher import scan
+
+def _extraction(prompt: str) -> Dict[str, Any]:
+    text = prompt.split("Text: ", 1)[-1].split("\n\nReturn", 1)[0]
+    sig = scan(text)
+    return {"vin_detected": sig.vin_detected, "vehicle_make": sig.make, "vehicle_model": sig.model,
+            "year": sig.year, "service_intent": sig.intents(), "urgency": "medium",
+            "raw_extraction_confidence": 0.8, "notes": None}
+
+def _error(status: int, message: str, kind: str, retry_after: float) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": kind}}, status_code=status,
+                        headers={"retry-after": str(math.ceil(retry_after)),
+                                 "retry-after-ms": str(int(retry_after * 1000))})
+
+def make_app(rps: float = 20.0, concurrency: int = 8, latency_ms: float = 30.0,
+             overload_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    stub = FastAPI()
+    rng = random.Random(seed)
+    state = {"tokens": rps, "refilled_at": time.monotonic(), "in_flight": 0}
+    stub.state.counts = counts = {"ok": 0, "rate_limited": 0, "overloaded": 0}
+
+    @stub.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        now = time.monotonic()
+        state["tokens"] = min(rps, state["tokens"] + (now - state["refilled_at"]) * rps)
+        state["refilled_at"] = now
+        if state["in_flight"] >= concurrency or state["tokens"] < 1.0:
+            counts["rate_limited"] += 1
+            wait = max(0.05, (1.0 - state["tokens"]) / rps)
+            return _error(429, "Rate limit reached for requests", "rate_limit_exceeded", wait)
+        state["tokens"] -= 1.0
+        if rng.random() < overload_rate:
+            counts["overloaded"] += 1
+            return _error(529, "Overloaded", "overloaded_error", 0.2)
+        state["in_flight"] += 1
+        try:
+            await asyncio.sleep(latency_ms / 1000.0)
+        finally:
+            state["in_flight"] -= 1
+        counts["ok"] += 1
+        content = json.dumps(_extraction(body["messages"][-1]["content"]))
+        return {"id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
+
+    return stub
+
+app = make_app()
@@ -0,0 +1,10 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def _pipeline_log(tmp_path, monkeypatch):
+    """Send each test's pipeline log to its tmp dir instead of the tracked pipeline.jsonl."""
+    from src.logsink import close_writer
+    monkeypatch.setenv("PIPELINE_LOG_PATH", str(tmp_path / "pipeline.jsonl"))
+    close_writer()
+    yield
+    close_writer()
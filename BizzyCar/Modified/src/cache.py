@@ -0,0 +1,185 @@
+import asyncio, copy, hashlib, json, os, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from .metrics import CACHE_EVENTS
+
+def cache_key(text: str, model: str, prompt_version: str) -> str:
+    """Content address for an extraction: redacted/truncated text + model + prompt."""
+    h = hashlib.sha256()
+    for part in (model, prompt_version, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class LRUCache:
+    """In-memory LRU tier with a size bound and per-entry TTL."""
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if self.ttl and time.time() - stored_at > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], stored_at: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (stored_at or time.time(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SQLiteCache:
+    """On-disk tier shared across CLI runs and uvicorn workers (WAL mode)."""
+    def __init__(self, path: str, ttl: float = 3600.0):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM extractions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if self.ttl and time.time() - stored_at > self.ttl:
+            return None
+        return stored_at, json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class ExtractionCache:
+    """Two-tier extraction cache with in-flight coalescing of duplicate keys.
+
+    Only successful model extractions are stored; failures propagate to every
+    waiter so each item still takes its own fallback path. If the owning task
+    is cancelled, its waiters retry the lookup and one of them computes instead.
+    """
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+    async def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            CACHE_EVENTS.inc("hit")
+            return value
+        if self.disk is not None:
+            found = await asyncio.to_thread(self.disk.get, key)
+            if found is not None:
+                stored_at, value = found
+                self.memory.set(key, value, stored_at=stored_at)
+                self.hits += 1
+                self.disk_hits += 1
+                CACHE_EVENTS.inc("disk_hit")
+                return value
+        return None
+
+    async def get_or_compute(self, key: str,
+                             compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        while True:
+            value = await self._lookup(key)
+            if value is not None:
+                return copy.deepcopy(value)
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            CACHE_EVENTS.inc("coalesced")
+            try:
+                return copy.deepcopy(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The owner was cancelled, not this waiter: look again or compute it here.
+
+        self.misses += 1
+        CACHE_EVENTS.inc("miss")
+        fut: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await compute()
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        except BaseException:
+            fut.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self.memory.set(key, copy.deepcopy(value))
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+        fut.set_result(value)
+        return value
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a value computed outside ``get_or_compute`` (e.g. a batched call)."""
+        self.memory.set(key, copy.deepcopy(value))
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cache_hits": self.hits, "cache_disk_hits": self.disk_hits,
+                "cache_misses": self.misses, "cache_coalesced": self.coalesced,
+                "cache_size": len(self.memory)}
+
+_cache: Optional[ExtractionCache] = None
+
+def get_cache() -> ExtractionCache:
+    """Process-wide extraction cache configured from env vars.
+
+    Controls via environment variables:
+      EXTRACTION_CACHE_SIZE (default 1024; 0 disables the memory tier)
+      EXTRACTION_CACHE_TTL (default 3600 seconds; 0 means no expiry)
+      EXTRACTION_CACHE_PATH (unset disables the SQLite tier)
+    """
+    global _cache
+    if _cache is None:
+        ttl = float(os.getenv("EXTRACTION_CACHE_TTL", "3600"))
+        memory = LRUCache(int(os.getenv("EXTRACTION_CACHE_SIZE", "1024")), ttl)
+        path = os.getenv("EXTRACTION_CACHE_PATH")
+        _cache = ExtractionCache(memory, SQLiteCache(path, ttl) if path else None)
+    return _cache
+
+def reset_cache() -> None:
+    """Drop the process-wide cache (closing any SQLite tier)."""
+    global _cache
+    if _cache is not None and _cache.disk is not None:
+        _cache.disk.close()
+    _cache = None
@@ -0,0 +1,257 @@
+import asyncio, json, os, sqlite3, threading, time, uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+from .processing import begin_run, log_event, process_notes
+
+TERMINAL = ("succeeded", "failed")
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+class JobStore:
+    """SQLite-backed job queue: one row per job plus one row per note and its result.
+
+    Results are committed a chunk at a time together with the job's ``done``
+    counter, so a job picked up again after a crash or restart continues from
+    its last committed chunk. Running jobs hold a lease that workers renew on a
+    timer while they work; a job whose lease has expired (its worker died) is
+    handed to the next worker that asks, which also lets several processes
+    share a queue.
+    """
+    def __init__(self, path: str, lease: float = 30.0):
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "total INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0, concurrency INTEGER NOT NULL, "
+            "batch_size INTEGER NOT NULL, created_at REAL NOT NULL, started_at REAL, "
+            "updated_at REAL NOT NULL, lease_until REAL NOT NULL DEFAULT 0, error TEXT);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);"
+            "CREATE TABLE IF NOT EXISTS items (job_id TEXT NOT NULL, idx INTEGER NOT NULL, "
+            "text TEXT NOT NULL, result TEXT, PRIMARY KEY (job_id, idx));")
+        self._conn.commit()
+
+    def create(self, notes: Iterable[str], concurrency: int = 8, batch_size: int = 1,
+               chunk: int = 1000) -> str:
+        """Store the notes and queue a job for them.
+
+        Notes are read and parsed outside the store lock and inserted ``chunk``
+        at a time, so a large ingest does not hold up other store calls. The
+        job row is only written once every note is in; if reading fails the
+        rows inserted so far are removed and the error propagates.
+        """
+        job_id = uuid.uuid4().hex
+        it = iter(notes)
+        total = 0
+        try:
+            while True:
+                rows = [(job_id, total + i, t) for i, t in enumerate(islice(it, chunk))]
+                if not rows:
+                    break
+                with self._lock, self._conn:
+                    self._conn.executemany("INSERT INTO items (job_id, idx, text) VALUES (?, ?, ?)", rows)
+                total += len(rows)
+        except BaseException:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            raise
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, total, concurrency, batch_size, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)", (job_id, total, concurrency, batch_size, now, now))
+        return job_id
+
+    def claim(self, exclude: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """Lease the oldest queued (or abandoned running) job not in ``exclude``, or None."""
+        now = time.time()
+        exclude = list(exclude)
+        ready = "(status = 'queued' OR (status = 'running' AND lease_until < ?))"
+        skip = f" AND id NOT IN ({', '.join('?' * len(exclude))})" if exclude else ""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT id FROM jobs WHERE {ready}{skip} ORDER BY created_at LIMIT 1",
+                (now, *exclude)).fetchone()
+            if row is None:
+                return None
+            claimed = self._conn.execute(
+                f"UPDATE jobs SET status = 'running', lease_until = ?, updated_at = ?, "
+                f"started_at = COALESCE(started_at, ?) WHERE id = ? AND {ready}",
+                (now + self.lease, now, now, row[0], now)).rowcount
+        return self.get(row[0]) if claimed else None
+
+    def pending(self, job_id: str, start: int, limit: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text FROM items WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+                (job_id, start, limit)).fetchall()
+        return [r[0] for r in rows]
+
+    def save_results(self, job_id: str, start: int, results: List[Dict[str, Any]]) -> None:
+        """Commit a chunk of results, advance ``done`` and renew the lease."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE items SET result = ? WHERE job_id = ? AND idx = ?",
+                                   ((json.dumps(r), job_id, start + i) for i, r in enumerate(results)))
+            self._conn.execute("UPDATE jobs SET done = ?, updated_at = ?, lease_until = ? WHERE id = ?",
+                               (start + len(results), now, now + self.lease, job_id))
+
+    def renew(self, job_id: str) -> None:
+        """Extend a running job's lease (called periodically while a chunk is processed)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                               (now + self.lease, job_id))
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ?, lease_until = 0 "
+                               "WHERE id = ?", (status, error, time.time(), job_id))
+
+    def release(self, job_id: str) -> None:
+        """Hand a running job back to the queue (graceful shutdown)."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = 'queued', lease_until = 0 "
+                               "WHERE id = ? AND status = 'running'", (job_id,))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, total, done, concurrency, batch_size, created_at, started_at, "
+                "updated_at, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job_id, status, total, done, concurrency, batch_size, created, started, updated, error = row
+        elapsed = updated - started if started else 0.0
+        return {"id": job_id, "status": status, "total": total, "done": done,
+                "progress": round(done / total, 4) if total else 1.0,
+                "notes_per_s": round(done / elapsed, 2) if elapsed > 0 else None,
+                "concurrency": concurrency, "batch_size": batch_size,
+                "created_at": _iso(created), "started_at": _iso(started),
+                "updated_at": _iso(updated), "error": error}
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Completed results in input order, each tagged with ``_input_idx``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, result FROM items WHERE job_id = ? AND idx >= ? AND result IS NOT NULL "
+                "ORDER BY idx LIMIT ?", (job_id, offset, limit)).fetchall()
+        return [{"_input_idx": idx, **json.loads(result)} for idx, result in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class JobRunner:
+    """Pool of background workers draining a ``JobStore``.
+
+    Each worker leases a job and runs it through ``process_notes`` one chunk
+    at a time, committing results after every chunk. New submissions wake an
+    idle worker immediately; otherwise workers poll every ``poll`` seconds
+    (which also picks up jobs queued by other processes or abandoned leases).
+    """
+    def __init__(self, store: JobStore, workers: int = 2, chunk_size: int = 256, poll: float = 1.0):
+        self.store = store
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.poll = poll
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._active: "set[str]" = set()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim, set(self._active))
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id, done = job["id"], job["done"]
+        self._active.add(job_id)
+        heartbeat = asyncio.create_task(self._renew(job_id))
+        begin_run(job_id, pin=True)
+        log_event("job_started", {"job_id": job_id, "total": job["total"], "resume_from": done})
+        try:
+            while done < job["total"]:
+                texts = await asyncio.to_thread(self.store.pending, job_id, done, self.chunk_size)
+                if not texts:
+                    break
+                results = await process_notes(texts, concurrency=job["concurrency"],
+                                              batch_size=job["batch_size"])
+                await asyncio.to_thread(self.store.save_results, job_id, done, results)
+                done += len(texts)
+            await asyncio.to_thread(self.store.finish, job_id, "succeeded")
+            log_event("job_finished", {"job_id": job_id, "total": job["total"]})
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back now rather than after its lease expires.
+            self.store.release(job_id)
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self.store.finish, job_id, "failed", str(e))
+            log_event("job_failed", {"job_id": job_id, "done": done}, error=str(e))
+        finally:
+            heartbeat.cancel()
+            self._active.discard(job_id)
+
+    async def _renew(self, job_id: str) -> None:
+        """Keep the lease alive while a chunk takes longer than the lease itself."""
+        while True:
+            await asyncio.sleep(self.store.lease / 3)
+            await asyncio.to_thread(self.store.renew, job_id)
+
+_runner: Optional[JobRunner] = None
+
+def get_job_runner(create: bool = True) -> Optional[JobRunner]:
+    """Process-wide job store and workers, started on first use.
+
+    With ``create=False`` (app startup) the runner only starts if the database
+    already exists, so jobs left by a previous run resume without every app
+    start creating an empty database.
+
+    Controls via environment variables:
+      JOBS_DB_PATH (default jobs.db; empty disables the job API)
+      JOBS_WORKERS (default 2 jobs processed concurrently)
+      JOBS_CHUNK_SIZE (default 256 notes per committed chunk)
+      JOBS_LEASE_SECONDS (default 30; a running job whose worker stops renewing is re-queued)
+    """
+    global _runner
+    if _runner is None:
+        path = os.getenv("JOBS_DB_PATH", "jobs.db")
+        if not path or (not create and not os.path.exists(path)):
+            return None
+        store = JobStore(path, lease=float(os.getenv("JOBS_LEASE_SECONDS", "30")))
+        _runner = JobRunner(store, workers=int(os.getenv("JOBS_WORKERS", "2")),
+                            chunk_size=int(os.getenv("JOBS_CHUNK_SIZE", "256")))
+        _runner.start()
+    return _runner
+
+async def stop_job_runner() -> None:
+    """Stop the workers, re-queue their jobs and close the store."""
+    global _runner
+    if _runner is not None:
+        runner, _runner = _runner, None
+        await runner.stop()
+        runner.store.close()
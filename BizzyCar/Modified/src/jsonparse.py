@@ -0,0 +1,109 @@
+import json, re
+from typing import Any, List, Optional, Tuple
+from pydantic_core import to_json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def loads(raw: str) -> Any:
+    """``json.loads`` via orjson when installed (its errors subclass JSONDecodeError)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def dumps(obj: Any, indent: Optional[int] = None) -> bytes:
+    """Serialize straight to UTF-8 JSON bytes (pydantic-core's Rust encoder)."""
+    return to_json(obj, indent=indent)
+
+FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+def _scan(raw: str, start: int) -> Tuple[Optional[int], List[str], bool, int]:
+    """Walk from ``raw[start]`` (an opening bracket) tracking strings and nesting.
+
+    Returns (end index of the matching close or None, still-open closers,
+    inside-string, index of the last string's opening quote or -1).
+    """
+    closers: List[str] = []
+    in_str = escaped = False
+    last_str = -1
+    for i in range(start, len(raw)):
+        c = raw[i]
+        if in_str:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+            last_str = i
+        elif c in "{[":
+            closers.append("}" if c == "{" else "]")
+        elif c in "}]":
+            if not closers or closers[-1] != c:
+                return None, closers, in_str, last_str
+            closers.pop()
+            if not closers:
+                return i, closers, False, last_str
+    return None, closers, in_str, last_str
+
+# A complete value can end this way; a cut number or literal (``20``, ``fals``) cannot be told apart.
+VALUE_END = re.compile(r'(?:["}\]]|\btrue|\bfalse|\bnull)$')
+
+def _close_truncated(body: str, closers: List[str], in_str: bool, last_str: int) -> Optional[str]:
+    """Close a document cut on a value boundary (only brackets missing), else None.
+
+    A cut inside a string, number or literal, or after an object key, would
+    turn into plausible but wrong data, so those are left for a retry.
+    """
+    if in_str:
+        return None
+    body = body.rstrip()
+    if body.endswith(","):
+        body = body[:-1].rstrip()
+    if not VALUE_END.search(body):
+        return None
+    if body.endswith('"') and closers[-1] == "}":
+        before = body[:last_str].rstrip()
+        if before.endswith(("{", ",")):
+            return None  # the string is a key whose value was cut off
+    return body + "".join(reversed(closers))
+
+def parse_model_json(raw: str) -> Tuple[Any, Optional[str]]:
+    """Parse model output, repairing the common failure modes without a retry.
+
+    Handles markdown code fences, prose around the payload, and output cut
+    between values (missing closing brackets only). Returns ``(value, repair)`` where
+    ``repair`` is None for clean JSON or names the fix applied; raises
+    ``json.JSONDecodeError`` when the text cannot be repaired.
+    """
+    try:
+        return loads(raw), None
+    except (json.JSONDecodeError, ValueError) as e:
+        error = e
+
+    text, repair = raw, "extract"
+    fence = FENCE.search(raw)
+    if fence:
+        text, repair = fence.group(1), "fence"
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise json.JSONDecodeError(f"no JSON value found ({error})", raw, 0)
+    start = min(starts)
+
+    end, closers, in_str, last_str = _scan(text, start)
+    if end is not None:
+        candidate = text[start:end + 1]
+    else:
+        candidate = _close_truncated(text[start:], closers, in_str, last_str - start)
+        repair = "truncation"
+        if candidate is None:
+            raise json.JSONDecodeError("model JSON cut mid-value", raw, len(raw))
+    try:
+        return loads(candidate), repair
+    except (json.JSONDecodeError, ValueError) as e:
+        raise json.JSONDecodeError(f"unrepairable model JSON ({e})", raw, 0)
@@ -0,0 +1,172 @@
+import atexit, json, os, queue, sys, threading
+from typing import Any, Dict, List, Optional
+
+class JsonlLogWriter:
+    """Queue-backed JSONL sink: callers enqueue dicts, a daemon thread serializes,
+    writes and flushes them in batches.
+
+    The queue is bounded; when it is full new events are dropped (and counted)
+    rather than blocking the event loop. Files rotate by size like
+    ``logging.handlers.RotatingFileHandler`` (``path.1`` ... ``path.N``).
+    If the file cannot be opened, written or rotated, the batch is dropped,
+    the first error is reported on stderr and the thread keeps draining
+    (reopening the file for the next batch).
+    """
+    def __init__(self, path: str, max_bytes: int = 50_000_000, backup_count: int = 5,
+                 max_queue: int = 10_000, batch_size: int = 512, flush_interval: float = 0.25):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.error: Optional[OSError] = None
+        self._closing = threading.Event()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="jsonl-log-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, entry: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until everything enqueued so far has been handled; False on timeout."""
+        q = self._queue
+        with q.all_tasks_done:
+            return q.all_tasks_done.wait_for(lambda: not q.unfinished_tasks, timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        if not self._thread.is_alive():
+            return
+        self._closing.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass  # the thread stops once it has drained the queue
+        self._thread.join(timeout=timeout)
+
+    def _open(self):
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        return open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self, f):
+        f.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            open(self.path, "w").close()
+        return self._open()
+
+    def _write(self, f, batch: List[Dict[str, Any]]):
+        lines = []
+        for entry in batch:
+            ts = entry.get("timestamp")
+            if ts is not None and not isinstance(ts, str):
+                entry["timestamp"] = ts.isoformat()
+            lines.append(json.dumps(entry, default=str))
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        if self.max_bytes and f.tell() >= self.max_bytes:
+            f = self._rotate(f)
+        return f
+
+    def _failed(self, e: OSError, lost: int) -> None:
+        self.dropped += lost
+        if self.error is None:
+            self.error = e
+            print(f"jsonl-log-writer: cannot write {self.path}: {e}; dropping events",
+                  file=sys.stderr)
+
+    def _run(self) -> None:
+        f = None
+        stop = False
+        while not stop:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._closing.is_set():
+                    break
+                continue
+            batch, taken = [], 1
+            if first is None:
+                stop = True
+            else:
+                batch.append(first)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    f = self._write(f or self._open(), batch)
+            except OSError as e:
+                self._failed(e, len(batch))
+                if f is not None and not f.closed:
+                    try:
+                        f.close()
+                    except OSError:
+                        pass
+                f = None
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+        if f is not None:
+            f.close()
+
+_writer: Optional[JsonlLogWriter] = None
+_writer_lock = threading.Lock()
+
+def log_path() -> str:
+    """Sink path from PIPELINE_LOG_PATH; ``{pid}`` expands to the worker's pid."""
+    return os.getenv("PIPELINE_LOG_PATH", "pipeline.jsonl").format(pid=os.getpid())
+
+def _max_bytes() -> int:
+    # Rotating a file other workers also append to loses their lines, so a
+    # shared path (no ``{pid}``) only rotates when asked to explicitly.
+    per_worker = "{pid}" in os.getenv("PIPELINE_LOG_PATH", "pipeline.jsonl")
+    return int(os.getenv("PIPELINE_LOG_MAX_BYTES", "50000000" if per_worker else "0"))
+
+def get_writer() -> JsonlLogWriter:
+    """Process-wide log writer, created on first use.
+
+    Controls via environment variables:
+      PIPELINE_LOG_PATH (default pipeline.jsonl; e.g. logs/pipeline-{pid}.jsonl per worker)
+      PIPELINE_LOG_MAX_BYTES (default 50000000 for {pid} paths, else 0; 0 disables rotation)
+      PIPELINE_LOG_BACKUPS (default 5)
+      PIPELINE_LOG_QUEUE (default 10000 pending events before dropping)
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = JsonlLogWriter(
+                    log_path(),
+                    max_bytes=_max_bytes(),
+                    backup_count=int(os.getenv("PIPELINE_LOG_BACKUPS", "5")),
+                    max_queue=int(os.getenv("PIPELINE_LOG_QUEUE", "10000")),
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+def close_writer() -> None:
+    """Flush and stop the process-wide writer (a new one starts on next use)."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
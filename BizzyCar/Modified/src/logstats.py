@@ -0,0 +1,252 @@
+"""Streaming analytics over pipeline JSONL logs.
+
+Reads logs (plus their rotated ``.N`` siblings, optionally ``.gz``/``.bz2``/``.xz``
+compressed) line by line, oldest first. Memory is bounded by the notes in flight
+and counters for the most recent runs, never by log size: older runs are
+folded into totals, and a run's unfinished notes are dropped when the run
+ends (its ``cache_stats`` event) or is folded. Latency percentiles come from a
+log-bucketed histogram (within ~2.5%).
+
+Usage (from BizzyCar/Modified):
+    python -m src.logstats pipeline.jsonl
+    python -m src.logstats logs/ --runs 50 --json report.json
+"""
+import argparse, bz2, glob, gzip, lzma, math, os, re, sys
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, IO, Iterator, List, Optional
+from .jsonparse import dumps, loads
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+ROTATED = re.compile(r"\.(\d+)(\.gz|\.bz2|\.xz)?$")
+
+class LatencyHistogram:
+    """Log-spaced buckets (5% wide) from 0.1 ms to ~1 h: constant memory percentiles."""
+    GROWTH = 1.05
+    FLOOR = 1e-4
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        b = 0 if seconds <= self.FLOOR else int(math.log(seconds / self.FLOOR, self.GROWTH)) + 1
+        self.counts[b] = self.counts.get(b, 0) + 1
+        self.n += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.n:
+            return None
+        rank, seen = q / 100.0 * self.n, 0
+        for b in sorted(self.counts):
+            seen += self.counts[b]
+            if seen >= rank:
+                # Geometric midpoint of the bucket, capped by the observed max.
+                return min(self.max, self.FLOOR * self.GROWTH ** (b - 0.5)) if b else self.FLOOR
+        return self.max
+
+class RunStats:
+    __slots__ = ("run_id", "first", "last", "notes", "fallbacks", "retries", "latency_sum", "latency_max")
+
+    def __init__(self, run_id: str, ts: float):
+        self.run_id, self.first, self.last = run_id, ts, ts
+        self.notes = self.fallbacks = self.retries = 0
+        self.latency_sum = self.latency_max = 0.0
+
+    def row(self) -> Dict[str, Any]:
+        span = self.last - self.first
+        return {"run_id": self.run_id, "started": datetime.fromtimestamp(self.first).isoformat(),
+                "notes": self.notes, "duration_s": round(span, 3),
+                "notes_per_s": round(self.notes / span, 2) if span > 0 else None,
+                "mean_ms": round(self.latency_sum / self.notes * 1000, 1) if self.notes else None,
+                "max_ms": round(self.latency_max * 1000, 1),
+                "fallback_rate": round(self.fallbacks / self.notes, 3) if self.notes else None,
+                "retries_per_note": round(self.retries / self.notes, 3) if self.notes else None}
+
+def expand_paths(paths: List[str]) -> List[str]:
+    """Files to read, oldest first: directories expand to ``*.jsonl*``; a log's
+    rotated siblings (``x.jsonl.3.gz`` ... ``x.jsonl.1``) precede it."""
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            bases = sorted(f for f in glob.glob(os.path.join(p, "*.jsonl*")) if not ROTATED.search(f))
+        else:
+            bases = [p]
+        for base in bases:
+            rotated = []
+            for f in glob.glob(glob.escape(base) + ".*"):
+                m = ROTATED.fullmatch(f[len(base):])
+                if m:
+                    rotated.append((int(m.group(1)), f))
+            out.extend(f for _, f in sorted(rotated, reverse=True))
+            if os.path.exists(base):
+                out.append(base)
+    return out
+
+def _open(path: str) -> IO[str]:
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, "rt", encoding="utf-8", errors="replace")
+
+def iter_events(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with _open(path) as f:
+            for line in f:
+                try:
+                    event = loads(line)
+                except ValueError:
+                    event = None
+                yield event if isinstance(event, dict) else {"event_type": "_malformed"}
+
+class Analyzer:
+    """Folds a stream of log events into run, latency, retry, fallback and intent stats.
+
+    Per-run stats are kept for the ``keep_runs`` most recently active runs;
+    older ones only survive in the totals.
+    """
+    def __init__(self, keep_runs: int = 256):
+        self.events = self.malformed = 0
+        self.latency = LatencyHistogram()
+        self.keep_runs = keep_runs
+        self.runs: "OrderedDict[str, RunStats]" = OrderedDict()
+        self.run_count = 0
+        self.folded_active = 0.0
+        self.unfinished = 0
+        self.methods: Dict[str, int] = {}
+        self.intents: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.fallback_causes: Dict[str, int] = {}
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self._pending: Dict[str, Dict[Any, float]] = {}  # run -> input_idx -> start ts
+        # Logs written before run ids existed: a repeated input_idx starts a new run.
+        self._legacy_run, self._legacy_seen = 0, set()
+
+    def _run_id(self, event: Dict[str, Any]) -> str:
+        run_id = event.get("run_id")
+        if run_id:
+            return run_id
+        if event["event_type"] == "extraction_start":
+            if event.get("input_idx") in self._legacy_seen:
+                self._legacy_run += 1
+                self._legacy_seen.clear()
+            self._legacy_seen.add(event.get("input_idx"))
+        return f"legacy-{self._legacy_run}"
+
+    def add(self, event: Dict[str, Any]) -> None:
+        self.events += 1
+        kind = event.get("event_type")
+        try:
+            ts = datetime.fromisoformat(event["timestamp"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            self.malformed += 1
+            return
+        self.first = ts if self.first is None else min(self.first, ts)
+        self.last = ts if self.last is None else max(self.last, ts)
+        run_id = self._run_id(event)
+        run = self.runs.get(run_id)
+        if run is None:
+            run = self.runs[run_id] = RunStats(run_id, ts)
+            self.run_count += 1
+            if len(self.runs) > self.keep_runs:
+                self._fold(next(iter(self.runs)))
+        else:
+            self.runs.move_to_end(run_id)
+        run.last = max(run.last, ts)
+
+        if kind == "extraction_start":
+            self._pending.setdefault(run_id, {})[event.get("input_idx")] = ts
+        elif kind == "cache_stats":
+            # End of a process_notes / stream_notes call: whatever hasn't completed never will.
+            self.unfinished += len(self._pending.pop(run_id, ()))
+        elif kind == "extraction_complete":
+            started = self._pending.get(run_id, {}).pop(event.get("input_idx"), None)
+            method = event.get("method", "unknown")
+            self.methods[method] = self.methods.get(method, 0) + 1
+            for intent in event.get("intents") or ["unknown"]:
+                self.intents[intent] = self.intents.get(intent, 0) + 1
+            run.notes += 1
+            run.fallbacks += method == "fallback"
+            if started is not None:
+                elapsed = max(0.0, ts - started)
+                self.latency.observe(elapsed)
+                run.latency_sum += elapsed
+                run.latency_max = max(run.latency_max, elapsed)
+        elif kind == "model_retry":
+            error_type = event.get("error_type", "unknown")
+            self.retries[error_type] = self.retries.get(error_type, 0) + 1
+            run.retries += 1
+        elif kind in ("extraction_retry_failed", "extraction_error"):
+            error_type = event.get("error_type", "unknown")
+            self.fallback_causes[error_type] = self.fallback_causes.get(error_type, 0) + 1
+
+    def _fold(self, run_id: str) -> None:
+        """Drop a run's per-run stats, keeping its active time and unfinished notes in the totals."""
+        run = self.runs.pop(run_id)
+        self.folded_active += run.last - run.first
+        self.unfinished += len(self._pending.pop(run_id, ()))
+
+    def report(self, max_runs: int = 20) -> Dict[str, Any]:
+        notes = sum(self.methods.values())
+        active = self.folded_active + sum(r.last - r.first for r in self.runs.values())
+        pct = lambda q: None if self.latency.percentile(q) is None else round(self.latency.percentile(q) * 1000, 1)
+        share = lambda counts, total: {k: {"count": v, "rate": round(v / total, 4) if total else None}
+                                       for k, v in sorted(counts.items(), key=lambda kv: -kv[1])}
+        runs = sorted(self.runs.values(), key=lambda r: r.first)
+        return {
+            "events": self.events, "malformed": self.malformed, "runs": self.run_count,
+            "notes": notes, "unfinished": self.unfinished + sum(map(len, self._pending.values())),
+            "first": datetime.fromtimestamp(self.first).isoformat() if self.first else None,
+            "last": datetime.fromtimestamp(self.last).isoformat() if self.last else None,
+            "notes_per_active_s": round(notes / active, 2) if active > 0 else None,
+            "latency_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99),
+                           "max": round(self.latency.max * 1000, 1), "n": self.latency.n},
+            "methods": share(self.methods, notes),
+            "retries_by_error": share(self.retries, notes),
+            "fallbacks_by_error": share(self.fallback_causes, notes),
+            "intents": share(self.intents, notes),
+            "recent_runs": [r.row() for r in runs[-max_runs:]],
+        }
+
+def _print(report: Dict[str, Any], out: IO[str]) -> None:
+    lat = report["latency_ms"]
+    print(f"{report['events']} events ({report['malformed']} malformed), {report['runs']} runs, "
+          f"{report['notes']} notes ({report['unfinished']} unfinished), {report['first']} .. {report['last']}", file=out)
+    print(f"throughput {report['notes_per_active_s']} notes/s while runs were active", file=out)
+    print(f"start->complete ms  p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}", file=out)
+    for title, key in (("methods", "methods"), ("retries per note by error", "retries_by_error"),
+                       ("fallbacks per note by error", "fallbacks_by_error"), ("intents per note", "intents")):
+        rows = ", ".join(f"{k} {v['count']} ({v['rate']:.1%})" for k, v in report[key].items()) or "-"
+        print(f"{title}: {rows}", file=out)
+    print(f"\n{'run':<14} {'started':<26} {'notes':>6} {'notes/s':>8} {'mean ms':>8} {'max ms':>8} "
+          f"{'fallback':>8} {'retry/n':>7}", file=out)
+    for r in report["recent_runs"]:
+        fmt = lambda v, spec: "-" if v is None else format(v, spec)
+        print(f"{r['run_id'][:14]:<14} {r['started'][:26]:<26} {r['notes']:>6} {fmt(r['notes_per_s'], '8.1f')} "
+              f"{fmt(r['mean_ms'], '8.1f')} {r['max_ms']:>8.1f} {fmt(r['fallback_rate'], '8.1%')} "
+              f"{fmt(r['retries_per_note'], '7.2f')}", file=out)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize pipeline JSONL logs without loading them.")
+    parser.add_argument("paths", nargs="*", default=["pipeline.jsonl"],
+                        help="Log files or directories (rotated/compressed siblings are included)")
+    parser.add_argument("--runs", type=int, default=20, help="Most recent runs to list")
+    parser.add_argument("--json", help="Also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+    paths = expand_paths(args.paths)
+    if not paths:
+        parser.error(f"no log files found in {args.paths}")
+    analyzer = Analyzer(keep_runs=max(args.runs, 256))
+    for event in iter_events(paths):
+        analyzer.add(event)
+    report = analyzer.report(args.runs)
+    _print(report, sys.stdout)
+    if args.json:
+        with open(args.json, "wb") as f:
+            f.write(dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,263 @@
-import argparse, asyncio, json
-from typing import List, Dict, Any
-from fastapi import FastAPI
-from pydantic import BaseModel
-from .processing import process_notes
+import argparse, asyncio, json, os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Any, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from .jobs import TERMINAL, get_job_runner, stop_job_runner
+from .jsonparse import dumps
+from .logsink import close_writer
+from .metrics import render_all, start_exporter, stop_exporter
+from .model_client import close_client
+from .processing import model_breaker, process_notes, stream_notes
+from .ratelimit import rate_limit_status
+from .scheduler import SchedulerStopped, get_scheduler, start_scheduler, stop_scheduler
+from .sharded import iter_input, parse_jsonl_messages, run_sharded
 
-app = FastAPI(title="BizzyCar Applied AI Service", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_exporter()
+    start_scheduler()
+    get_job_runner(create=False)  # resume jobs left by a previous run
+    yield
+    await stop_job_runner()
+    await stop_scheduler()
+    stop_exporter()
+    await close_client()
+    close_writer()
+
+app = FastAPI(title="BizzyCar Applied AI Service", version="0.1.0", lifespan=lifespan)
 
 class AnalyzeIn(BaseModel):
     messages: List[str]
+    concurrency: int = Field(default=1, ge=1, le=64)
+    batch_size: int = Field(default=1, ge=1, le=32)
+    deadline_ms: Optional[int] = Field(default=None, ge=1)
 
 @app.get("/healthz")
 async def healthz():
-    return {"status": "ok"}
+    return {"status": "ok", "model_circuit": model_breaker().status(),
+            "model_rate_limits": rate_limit_status()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format; summed across workers when METRICS_DIR is set."""
+    return PlainTextResponse(render_all(), media_type="text/plain; version=0.0.4")
 
 @app.post("/analyze")
-async def analyze(payload: AnalyzeIn):
-    out = await process_notes(payload.messages)
-    return {"items": out}
+async def analyze(payload: AnalyzeIn, request: Request):
+    """Extract a batch. With coalescing enabled, notes share server-side batches
+    (per-request concurrency/batch_size are then ignored in favour of the scheduler's)."""
+    scheduler = get_scheduler()
+    timeout = payload.deadline_ms / 1000.0 if payload.deadline_ms else None
+    if scheduler is None:
+        work = process_notes(payload.messages, concurrency=payload.concurrency,
+                             batch_size=payload.batch_size)
+    else:
+        work = scheduler.submit(payload.messages, timeout=timeout)
+        timeout = None  # the scheduler enforces the deadline itself
+    task = asyncio.ensure_future(asyncio.wait_for(work, timeout))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=0.1)
+            if done:
+                break
+            if await request.is_disconnected():
+                task.cancel()
+                return Response(status_code=499)
+        out = task.result()
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="deadline exceeded")
+    except SchedulerStopped:
+        raise HTTPException(status_code=503, detail="server shutting down")
+    finally:
+        if not task.done():
+            task.cancel()
+    return Response(dumps({"items": out}), media_type="application/json")
+
+@app.post("/analyze/stream")
+async def analyze_stream(payload: AnalyzeIn):
+    """NDJSON: one result line per note, emitted as soon as it is ready."""
+    async def lines() -> AsyncIterator[bytes]:
+        async for idx, item in stream_notes(payload.messages, concurrency=payload.concurrency,
+                                            batch_size=payload.batch_size):
+            yield dumps({"_input_idx": idx, **item}) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+class JobIn(BaseModel):
+    messages: Optional[List[str]] = None
+    path: Optional[str] = Field(default=None, description="Server-side JSON or JSONL input file")
+    concurrency: int = Field(default=8, ge=1, le=64)
+    batch_size: int = Field(default=1, ge=1, le=32)
+
+def _runner_or_503():
+    runner = get_job_runner()
+    if runner is None:
+        raise HTTPException(status_code=503, detail="job API disabled (JOBS_DB_PATH is empty)")
+    return runner
+
+async def _job_or_404(job_id: str) -> Dict[str, Any]:
+    job = await asyncio.to_thread(_runner_or_503().store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+def _job_input_path(path: str) -> str:
+    """Resolve a server-side job input, which must lie inside the input directory.
+
+    Controls via environment variables:
+      JOBS_INPUT_DIR (directory 'path' inputs may be read from; unset rejects them)
+    """
+    root = os.getenv("JOBS_INPUT_DIR")
+    if not root:
+        raise HTTPException(status_code=403, detail="server-side 'path' inputs are disabled (JOBS_INPUT_DIR unset)")
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(status_code=403, detail=f"input path is outside JOBS_INPUT_DIR: {path}")
+    if not os.path.isfile(resolved):
+        raise HTTPException(status_code=422, detail=f"input path not found: {path}")
+    return resolved
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request, concurrency: int = Query(default=8, ge=1, le=64),
+                     batch_size: int = Query(default=1, ge=1, le=32)):
+    """Queue a batch for background extraction and return its job id.
+
+    Body is either JSON (``messages`` or a ``path`` relative to
+    JOBS_INPUT_DIR, plus ``concurrency``/``batch_size``) or an
+    ``application/x-ndjson`` upload with one note per line (settings then come
+    from the query string).
+    """
+    runner = _runner_or_503()
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    if ndjson:
+        notes = parse_jsonl_messages((await request.body()).splitlines())
+    else:
+        try:
+            payload = JobIn.model_validate(await request.json())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="body must be JSON or NDJSON")
+        if (payload.messages is None) == (payload.path is None):
+            raise HTTPException(status_code=422, detail="provide exactly one of 'messages' or 'path'")
+        notes = payload.messages if payload.path is None else iter_input(_job_input_path(payload.path))
+        concurrency, batch_size = payload.concurrency, payload.batch_size
+    try:
+        job_id = await asyncio.to_thread(runner.store.create, notes, concurrency, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400 if ndjson else 422, detail=f"unreadable input: {e}")
+    runner.notify()
+    return await asyncio.to_thread(runner.store.get, job_id)
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status and progress (done/total, notes/s) of a job."""
+    return await _job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = Query(default=0, ge=0),
+                      limit: int = Query(default=100, ge=1, le=1000)):
+    """A page of completed results in input order; ``next_offset`` is null once all are read."""
+    job = await _job_or_404(job_id)
+    items = await asyncio.to_thread(_runner_or_503().store.results, job_id, offset, limit)
+    end = offset + len(items)
+    more = end < job["total"] and (job["status"] not in TERMINAL or end < job["done"])
+    return Response(dumps({"job": job, "offset": offset, "items": items,
+                           "next_offset": end if more else None}), media_type="application/json")
+
+@app.get("/jobs/{job_id}/results/stream")
+async def job_results_stream(job_id: str, offset: int = Query(default=0, ge=0)):
+    """NDJSON of completed results, following the job until it finishes."""
+    await _job_or_404(job_id)
+    store = _runner_or_503().store
+
+    async def lines() -> AsyncIterator[bytes]:
+        pos = offset
+        while True:
+            rows = await asyncio.to_thread(store.results, job_id, pos, 500)
+            for row in rows:
+                yield dumps(row) + b"\n"
+            if rows:
+                pos = rows[-1]["_input_idx"] + 1
+                continue
+            job = await asyncio.to_thread(store.get, job_id)
+            if job is None or job["status"] in TERMINAL:
+                return
+            await asyncio.sleep(0.5)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def completed_lines(path: str) -> int:
+    """Count complete result lines in a JSONL output, truncating a torn final line."""
+    if not os.path.exists(path):
+        return 0
+    done, good_end = 0, 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                json.loads(line)
+            except json.JSONDecodeError:
+                break
+            done += 1
+            good_end += len(line)
+    with open(path, "r+b") as f:
+        f.truncate(good_end)
+    return done
+
+async def _run_cli(msgs: List[str], concurrency: int, batch_size: int) -> List[Dict[str, Any]]:
+    try:
+        return await process_notes(msgs, concurrency=concurrency, batch_size=batch_size)
+    finally:
+        await close_client()
+
+async def _run_cli_stream(input_path: str, output_path: str, concurrency: int,
+                          batch_size: int, resume: bool) -> int:
+    start = completed_lines(output_path) if resume else 0
+    msgs = iter_input(input_path)
+    for _ in range(start):
+        next(msgs, None)
+    written = 0
+    try:
+        with open(output_path, "ab" if resume else "wb") as f:
+            async for idx, item in stream_notes(msgs, concurrency=concurrency,
+                                                batch_size=batch_size, start=start):
+                f.write(dumps({"_input_idx": idx, **item}) + b"\n")
+                written += 1
+    finally:
+        await close_client()
+    return written
 
 def cli():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True, help="Path to JSON with {'messages': [..]}")
-    parser.add_argument("--output", required=True, help="Path to write JSON results")
+    parser.add_argument("--input", required=True, help="Path to JSON with {'messages': [..]} or JSONL (one note per line)")
+    parser.add_argument("--output", required=True, help="Path to write JSON results (JSONL when streaming)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Max notes extracted in parallel")
+    parser.add_argument("--batch-size", type=int, default=1, help="Max notes packed into one model request")
+    parser.add_argument("--stream", action="store_true", help="Write JSONL output incrementally (implied by a .jsonl/.ndjson input)")
+    parser.add_argument("--resume", action="store_true", help="With --stream, continue after the last completed line in --output")
+    parser.add_argument("--workers", type=int, default=1, help="Process-pool workers; >1 shards the input and merges results in order")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Notes per shard with --workers (finished shards are skipped on re-run)")
     args = parser.parse_args()
+    if args.workers > 1:
+        n = run_sharded(args.input, args.output, args.workers, shard_size=args.shard_size,
+                        concurrency=args.concurrency, batch_size=args.batch_size)
+        print(f"Wrote {n} items to {args.output}")
+        return
+    if args.stream or args.resume or args.input.endswith((".jsonl", ".ndjson")):
+        n = asyncio.run(_run_cli_stream(args.input, args.output, args.concurrency,
+                                        args.batch_size, args.resume))
+        print(f"Wrote {n} items to {args.output}")
+        return
     with open(args.input, "r") as f:
         data = json.load(f)
     msgs = data.get("messages", [])
-    out = asyncio.run(process_notes(msgs))
-    with open(args.output, "w") as f:
-        json.dump({"items": out}, f, indent=2)
+    out = asyncio.run(_run_cli(msgs, args.concurrency, args.batch_size))
+    with open(args.output, "wb") as f:
+        f.write(dumps({"items": out}, indent=2))
     print(f"Wrote {args.output}")
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple
+
+# Substring keywords (matched against the lower-cased note). Note that "ac"
+# deliberately keeps its historical substring semantics ("accord" hits it too).
+KEYWORDS: Tuple[str, ...] = (
+    "oil", "tire", "pressure", "rotation", "battery", "brak", "ac", "a/c",
+    "check engine", "check-engine", "inspect",
+    "camry", "accord", "rogue", "f-150", "f150",
+)
+
+# Signals that keep a low-confidence model answer from being retried.
+STRONG_SIGNALS: Tuple[str, ...] = ("check engine", "brak", "battery", "tire", "oil")
+# Signals that earn the calibration boost (historically also includes "ac").
+CALIBRATION_SIGNALS: Tuple[str, ...] = STRONG_SIGNALS + ("ac",)
+
+# Later entries win, matching the original if-chain order.
+VEHICLES: Tuple[Tuple[Tuple[str, ...], str, str], ...] = (
+    (("camry",), "Toyota", "Camry"),
+    (("accord",), "Honda", "Accord"),
+    (("rogue",), "Nissan", "Rogue"),
+    (("f-150", "f150"), "Ford", "F-150"),
+)
+
+# Words a rule-covered note may contain besides its year: the vehicle and
+# intent vocabulary above plus filler. Anything else (another service such as
+# an inspection, an issue the rules don't know, an urgency cue, a VIN) means
+# the rules alone can't give a complete answer.
+COVERED_WORDS: FrozenSet[str] = frozenset("""
+    oil change changed changes tire tires rotation rotate rotated pressure battery brake brakes
+    ac a/c check engine check-engine light camry accord rogue f-150 f150 toyota honda nissan ford
+    a an the for and in on at my our his her their to of is car vehicle customer needs need wants
+    due please service scheduled
+""".split())
+WORD = re.compile(r"[a-z0-9][a-z0-9/-]*")
+
+# Standalone model years only: not digits inside mileage, RO or part numbers.
+YEAR = re.compile(r"\b(19[89]\d|20\d{2})\b")
+VIN = re.compile(r"\b[0-9A-Z]{11,17}\b")
+
+@dataclass(frozen=True)
+class NoteSignals:
+    """Everything the keyword heuristics need from one note."""
+    keywords: FrozenSet[str]
+    year: Optional[int]
+    make: Optional[str]
+    model: Optional[str]
+    vin_detected: bool = False
+
+    def has(self, *keywords: str) -> bool:
+        return any(k in self.keywords for k in keywords)
+
+    @property
+    def strong_signal(self) -> bool:
+        return self.has(*STRONG_SIGNALS)
+
+    @property
+    def calibration_signal(self) -> bool:
+        return self.has(*CALIBRATION_SIGNALS)
+
+    def intents(self, tire_prefers: str = "tire_rotation") -> List[str]:
+        """Service intents implied by keywords, in the pipeline's canonical order.
+
+        ``tire_prefers`` names the tire intent chosen when its own keyword
+        ("rotation" / "pressure") is present; otherwise the other one is used.
+        """
+        intents = []
+        if "oil" in self.keywords: intents.append("oil_change")
+        if "tire" in self.keywords:
+            if tire_prefers == "tire_rotation":
+                intents.append("tire_rotation" if "rotation" in self.keywords else "tire_pressure")
+            else:
+                intents.append("tire_pressure" if "pressure" in self.keywords else "tire_rotation")
+        if "battery" in self.keywords: intents.append("battery")
+        if "brak" in self.keywords: intents.append("brake_service")
+        if self.has("ac", "a/c"): intents.append("ac_service")
+        if self.has("check engine", "check-engine"): intents.append("engine_diagnostic")
+        return intents or ["unknown"]
+
+@lru_cache(maxsize=2048)
+def scan(text: str) -> NoteSignals:
+    """Analyse a note once; repeated calls for the same text are cache hits.
+
+    Uses C-level substring checks over a single lower-cased copy: on 2000-char
+    notes this measured several times faster than one combined regex
+    alternation (see ``bench/bench_matcher.py``).
+    """
+    t = text.lower()
+    keywords = frozenset(filter(t.__contains__, KEYWORDS))
+    m = YEAR.search(text)
+    make = model = None
+    for aliases, vmake, vmodel in VEHICLES:
+        if any(a in keywords for a in aliases):
+            make, model = vmake, vmodel
+    return NoteSignals(keywords, int(m.group(1)) if m else None, make, model,
+                       bool(VIN.search(text)))
+
+def has_unmapped_words(text: str) -> bool:
+    """Whether ``text`` has a word outside ``COVERED_WORDS`` (stops at the first)."""
+    return any(w.group() not in COVERED_WORDS and not YEAR.fullmatch(w.group())
+               for w in WORD.finditer(text.lower()))
+
+def rule_coverage(sig: NoteSignals, text: Optional[str] = None) -> float:
+    """How completely the rules alone cover a note (0.0-1.0).
+
+    Full coverage means a known make/model, a year and exactly one
+    strong-signal intent, i.e. nothing left for a model to disambiguate.
+    Given the note's ``text``, one with words the rules can't map (see
+    ``COVERED_WORDS``) has no coverage at all.
+    """
+    if text is not None and has_unmapped_words(text):
+        return 0.0
+    intents = sig.intents()
+    score = 0.0
+    if sig.make and sig.model: score += 0.35
+    if sig.year: score += 0.25
+    if len(intents) == 1 and intents != ["unknown"] and sig.strong_signal: score += 0.4
+    return round(score, 2)
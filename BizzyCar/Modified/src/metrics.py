@@ -0,0 +1,159 @@
+import bisect, glob, json, os, threading, time
+from typing import Dict, List, Optional, Tuple
+
+# Latency buckets in seconds: sub-millisecond CPU stages up to slow model calls.
+BUCKETS: Tuple[float, ...] = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                              0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Counter:
+    """Monotonic counter keyed by a single label value."""
+    def __init__(self, name: str, help: str, label: str):
+        self.name, self.help, self.label = name, help, label
+        self.values: Dict[str, float] = {}
+
+    def inc(self, label_value: str, amount: float = 1.0) -> None:
+        self.values[label_value] = self.values.get(label_value, 0.0) + amount
+
+    def snapshot(self) -> Dict[str, float]:
+        return dict(self.values)
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a single label value.
+
+    ``observe`` is a bisect plus two additions; buckets are stored
+    non-cumulative and accumulated only when rendering.
+    """
+    def __init__(self, name: str, help: str, label: str, buckets: Tuple[float, ...] = BUCKETS):
+        self.name, self.help, self.label, self.buckets = name, help, label, buckets
+        self.values: Dict[str, List[float]] = {}  # label -> bucket counts + [+Inf, sum]
+
+    def observe(self, label_value: str, seconds: float) -> None:
+        row = self.values.get(label_value)
+        if row is None:
+            row = self.values[label_value] = [0.0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, seconds)] += 1
+        row[-1] += seconds
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        return {k: list(v) for k, v in self.values.items()}
+
+STAGE_SECONDS = Histogram("bizzycar_stage_seconds", "Per-stage pipeline latency.", "stage")
+MODEL_RETRIES = Counter("bizzycar_model_retries_total", "Model retries by exception type.", "error_type")
+EXTRACTIONS = Counter("bizzycar_extractions_total", "Completed extractions by method.", "method")
+CACHE_EVENTS = Counter("bizzycar_cache_events_total", "Extraction cache lookups by result.", "result")
+BREAKER_TRANSITIONS = Counter("bizzycar_breaker_transitions_total", "Model circuit breaker transitions by new state.", "state")
+RATE_LIMIT_EVENTS = Counter("bizzycar_rate_limit_events_total", "Model throttles, slow calls, transient retries and exhausted retries.", "event")
+
+REGISTRY: List = [STAGE_SECONDS, MODEL_RETRIES, EXTRACTIONS, CACHE_EVENTS, BREAKER_TRANSITIONS, RATE_LIMIT_EVENTS]
+
+class stage:
+    """``with stage("redaction"): ...`` records the block's duration."""
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+def _snapshot() -> Dict[str, Dict]:
+    return {m.name: m.snapshot() for m in REGISTRY}
+
+def _merge(snapshots: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    merged: Dict[str, Dict] = {m.name: {} for m in REGISTRY}
+    for snap in snapshots:
+        for name, series in snap.items():
+            target = merged.setdefault(name, {})
+            for label, value in series.items():
+                if isinstance(value, list):
+                    row = target.setdefault(label, [0.0] * len(value))
+                    for i, v in enumerate(value):
+                        row[i] += v
+                else:
+                    target[label] = target.get(label, 0.0) + value
+    return merged
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+def render(snapshot: Optional[Dict[str, Dict]] = None) -> str:
+    """Prometheus text exposition (format 0.0.4) of the given or local snapshot."""
+    snapshot = snapshot if snapshot is not None else _snapshot()
+    lines: List[str] = []
+    for m in REGISTRY:
+        series = snapshot.get(m.name, {})
+        kind = "histogram" if isinstance(m, Histogram) else "counter"
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {kind}")
+        for label in sorted(series):
+            value = series[label]
+            lbl = f'{m.label}="{label}"'
+            if kind == "counter":
+                lines.append(f"{m.name}{{{lbl}}} {_fmt(value)}")
+                continue
+            cumulative = 0.0
+            for bound, count in zip(m.buckets, value):
+                cumulative += count
+                lines.append(f'{m.name}_bucket{{{lbl},le="{bound}"}} {_fmt(cumulative)}')
+            cumulative += value[-2]
+            lines.append(f'{m.name}_bucket{{{lbl},le="+Inf"}} {_fmt(cumulative)}')
+            lines.append(f"{m.name}_sum{{{lbl}}} {value[-1]!r}")
+            lines.append(f"{m.name}_count{{{lbl}}} {_fmt(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+# Multi-worker support: with METRICS_DIR set, each worker periodically writes
+# its snapshot to METRICS_DIR/<pid>.json and /metrics sums every file there.
+_exporter: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+def metrics_dir() -> Optional[str]:
+    return os.getenv("METRICS_DIR") or None
+
+def dump_snapshot() -> None:
+    d = metrics_dir()
+    if not d:
+        return
+    os.makedirs(d, exist_ok=True)
+    path = os.path.join(d, f"{os.getpid()}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp, path)
+
+def start_exporter(interval: float = 5.0) -> None:
+    """Start the per-worker snapshot thread (no-op unless METRICS_DIR is set)."""
+    global _exporter
+    if not metrics_dir() or (_exporter is not None and _exporter.is_alive()):
+        return
+    _stop.clear()
+
+    def run():
+        while not _stop.wait(interval):
+            dump_snapshot()
+
+    _exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+    _exporter.start()
+
+def stop_exporter() -> None:
+    _stop.set()
+    dump_snapshot()
+
+def render_all() -> str:
+    """Render this worker's metrics, or the sum over all workers when METRICS_DIR is set."""
+    d = metrics_dir()
+    if not d:
+        return render()
+    dump_snapshot()
+    snapshots = []
+    for path in glob.glob(os.path.join(d, "*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return render(_merge(snapshots))
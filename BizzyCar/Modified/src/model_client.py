@@ -1,32 +1,21 @@
 import os, random, re, json, asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from .matcher import scan
+from .ratelimit import RateLimited, get_rate_limiter
 from .schemas import Extraction
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
-class RealAPIClient:
-    """
-    Real LLM client using any OpenAI-compatible API provider.
-    Supports: OpenRouter, Together AI, Ollama, or any OpenAI-compatible endpoint.
-    """
-    def __init__(self, api_key: str, base_url: str, model: str = "gpt-4"):
-        from openai import OpenAI
-        self.api_key = api_key
-        self.base_url = base_url
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
-        self.model = model
-    async def extract(self, text: str) -> str:
-        """Extract service insights using real GPT-4 API."""
-        prompt = f"""Extract service information from this dealership note. Return JSON only.
+import httpx
 
-Text: {text}
+# Bump whenever the extraction prompt changes so cached results are invalidated.
+PROMPT_VERSION = "v1"
 
-Return valid JSON with these fields:
-{{
+EXTRACTION_FIELDS = """{
   "vin_detected": boolean,
   "vehicle_make": string or null,
   "vehicle_model": string or null,
@@ -35,27 +24,84 @@ Return valid JSON with these fields:
   "urgency": "low"|"medium"|"high",
   "raw_extraction_confidence": float 0.0-1.0,
   "notes": string or null
-}}
+}"""
 
-Rules:
+EXTRACTION_RULES = """Rules:
 - If you detect VIN (11-17 alphanumeric), set vin_detected to true
 - Extract year from text (4-digit number)
 - Identify service needs from keywords
 - Set confidence based on how clear the text is
 - Only include actual services mentioned, use "unknown" if none found"""
 
-        try:
-            response = self.client.chat.completions.create(
+class RealAPIClient:
+    """
+    Real LLM client using any OpenAI-compatible API provider.
+    Supports: OpenRouter, Together AI, Ollama, or any OpenAI-compatible endpoint.
+
+    Holds one pooled keep-alive HTTP connection set for its whole lifetime;
+    pool limits and timeouts come from env vars (see ``_http_client``).
+    Calls go through the model's rate-limit controller (``get_rate_limiter``),
+    which owns 429 / overload and transient-error retries, so the SDK's own
+    retries are off then.
+    """
+    def __init__(self, api_key: str, base_url: str, model: str = "gpt-4",
+                 http_client: Optional[httpx.AsyncClient] = None):
+        from openai import AsyncOpenAI, DEFAULT_MAX_RETRIES
+        self.api_key = api_key
+        self.base_url = base_url
+        self.http_client = http_client or _http_client()
+        self.limiter = get_rate_limiter(model)
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client,
+                                  max_retries=0 if self.limiter else DEFAULT_MAX_RETRIES)
+        self.model = model
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    async def _complete(self, prompt: str, max_tokens: int, items: int = 1) -> str:
+        def request():
+            return self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
+                max_tokens=max_tokens,
                 temperature=0.3
             )
 
+        try:
+            response = await (self.limiter.call(request, items) if self.limiter else request())
             return response.choices[0].message.content
+        except RateLimited:
+            raise
         except Exception as e:
             raise Exception(f" AI API error: {str(e)}")
 
+    async def extract(self, text: str) -> str:
+        """Extract service insights using real GPT-4 API."""
+        prompt = f"""Extract service information from this dealership note. Return JSON only.
+
+Text: {text}
+
+Return valid JSON with these fields:
+{EXTRACTION_FIELDS}
+
+{EXTRACTION_RULES}"""
+        return await self._complete(prompt, max_tokens=500)
+
+    async def extract_batch(self, texts: List[str]) -> str:
+        """Extract several notes in one request; returns a JSON array with an ``index`` per item."""
+        notes = json.dumps([{"index": i, "text": t} for i, t in enumerate(texts)], ensure_ascii=False)
+        prompt = f"""Extract service information from each dealership note below. Return JSON only.
+
+Notes (JSON array of {{"index", "text"}}):
+{notes}
+
+Return a JSON array with exactly one object per note, in any order. Each object must
+carry the note's "index" plus these fields:
+{EXTRACTION_FIELDS}
+
+{EXTRACTION_RULES}"""
+        return await self._complete(prompt, max_tokens=100 + 250 * len(texts), items=len(texts))
+
 class MockLLMClient:
     """
     Simulates an LLM with occasional hallucinations and malformed JSON.
@@ -68,35 +114,17 @@ class MockLLMClient:
         self.hallu_rate = float(os.getenv("MOCK_HALLUCINATION_RATE", "0.25"))
         random.seed(42)
 
-    async def extract(self, text: str) -> str:
-        intents = []
-        t = text.lower()
-        if "oil" in t: intents.append("oil_change")
-        if "tire" in t: intents.extend(["tire_pressure" if "pressure" in t else "tire_rotation"])
-        if "battery" in t: intents.append("battery")
-        if "brak" in t: intents.append("brake_service")
-        if "ac" in t or "a/c" in t: intents.append("ac_service")
-        if "check-engine" in t or "check engine" in t: intents.append("engine_diagnostic")
-        if not intents:
-            intents.append("unknown")
-
-        make = None
-        model = None
-        year = None
-        m = re.search(r"(20\d{2}|19\d{2})", text)
-        if m:
-            year = int(m.group(1))
-        if "camry" in t: make, model = "Toyota", "Camry"
-        if "accord" in t: make, model = "Honda", "Accord"
-        if "rogue" in t: make, model = "Nissan", "Rogue"
-        if "f-150" in t or "f150" in t: make, model = "Ford", "F-150"
+    def _extract_obj(self, text: str) -> Dict[str, Any]:
+        sig = scan(text)
+        intents = sig.intents(tire_prefers="tire_pressure")
+        make, model, year = sig.make, sig.model, sig.year
 
         if random.random() < self.hallu_rate:
             intents.append("inspection")
             if year: year += random.choice([1, -1])
 
         data = {
-            "vin_detected": bool(re.search(r"\b[0-9A-Z]{11,17}\b", text)),
+            "vin_detected": sig.vin_detected,
             "vehicle_make": make,
             "vehicle_model": model,
             "year": year,
@@ -105,12 +133,54 @@ class MockLLMClient:
             "raw_extraction_confidence": round(random.uniform(0.55, 0.9), 2),
             "notes": None
         }
-        payload = json.dumps(data)
+        return data
+
+    def _maybe_truncate(self, payload: str) -> str:
         if random.random() < self.bad_json_rate:
             payload = payload[:-1]  # drop closing brace
+        return payload
+
+    async def extract(self, text: str) -> str:
+        payload = self._maybe_truncate(json.dumps(self._extract_obj(text)))
         await asyncio.sleep(0)
         return payload
 
+    async def extract_batch(self, texts: List[str]) -> str:
+        items = [{"index": i, **self._extract_obj(t)} for i, t in enumerate(texts)]
+        payload = self._maybe_truncate(json.dumps(items))
+        await asyncio.sleep(0)
+        return payload
+
+def _http_client() -> httpx.AsyncClient:
+    """Build the pooled HTTP transport shared by every model call.
+
+    Controls via environment variables:
+      LLM_MAX_CONNECTIONS (default 20)
+      LLM_MAX_KEEPALIVE (default 10)
+      LLM_KEEPALIVE_EXPIRY (default 30 seconds)
+      LLM_TIMEOUT_SECONDS (default 30)
+      LLM_CONNECT_TIMEOUT (default 5)
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+    )
+    timeout = httpx.Timeout(
+        float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+        connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+def model_name() -> str:
+    """Name of the model currently backing extraction (used in cache keys)."""
+    if os.getenv("USE_REAL_API", "false").lower() == "true":
+        return os.getenv("LLM_MODEL", "gpt-4")
+    return "mock"
+
+_client: Optional[RealAPIClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
 async def get_client():
     """Get either real API client or mock client based on env vars.
     
@@ -119,9 +189,16 @@ async def get_client():
     - Together AI (https://api.together.ai/v1)
     - Ollama (http://localhost:11434/v1)
     - Any custom OpenAI-compatible endpoint
+
+    The real client is created once per process (and event loop) and reused
+    across calls and retries; call ``close_client`` on shutdown.
     """
+    global _client, _client_loop
     use_real_api = os.getenv("USE_REAL_API", "false").lower() == "true"
     if use_real_api:
+        loop = asyncio.get_running_loop()
+        if _client is not None and _client_loop is loop:
+            return _client
         api_key = os.getenv("LLM_API_KEY")
         base_url = os.getenv("LLM_BASE_URL")
         model = os.getenv("LLM_MODEL", "gpt-4")
@@ -130,6 +207,15 @@ async def get_client():
         if not base_url:
             raise ValueError("LLM_BASE_URL environment variable not set")
 
-        return RealAPIClient(api_key, base_url, model)
+        _client = RealAPIClient(api_key, base_url, model)
+        _client_loop = loop
+        return _client
     else:
         return MockLLMClient()
+
+async def close_client() -> None:
+    """Close the shared real client, if one was created."""
+    global _client, _client_loop
+    if _client is not None:
+        client, _client, _client_loop = _client, None, None
+        await client.aclose()
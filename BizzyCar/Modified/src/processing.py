@@ -1,58 +1,112 @@
-import json, re, asyncio, logging, sys
-from typing import List, Dict, Any, Optional
+import json, os, asyncio, uuid
+from contextvars import ContextVar
+from itertools import islice
+from typing import AsyncIterator, Iterable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from pydantic import ValidationError
-from .model_client import get_client
-from .validators import validate_extraction
-
-# Setup structured logging (JSONL)
-logger = logging.getLogger(__name__)
-log_handler = logging.FileHandler('pipeline.jsonl', mode='a')
-log_handler.setFormatter(logging.Formatter('%(message)s'))
-logger.addHandler(log_handler)
-logger.setLevel(logging.INFO)
-
-PII_EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-PII_PHONE = re.compile(r"\+?\d[\d\-\s]{7,}\d")
-
-def redact(text: str) -> str:
-    text = PII_EMAIL.sub("<redacted_email>", text)
-    text = PII_PHONE.sub("<redacted_phone>", text)
-    return text
+from tenacity import retry, stop_after_attempt, wait_exponential
+from .cache import cache_key, get_cache
+from .jsonparse import parse_model_json
+from .logsink import get_writer
+from .matcher import rule_coverage, scan
+from .metrics import BREAKER_TRANSITIONS, EXTRACTIONS, MODEL_RETRIES, stage
+from .model_client import PROMPT_VERSION, get_client, model_name
+from .redaction import redact, redact_with_spans
+from .resilience import CircuitBreaker, CircuitOpen, get_breaker, get_retry_budget
+from .schemas import Extraction
+from .validators import validate_extraction, validate_extractions
+
+# Tags every log record with the batch run it belongs to, so analytics can
+# tell runs apart even though input_idx restarts at 0 for each one.
+_RUN_ID: ContextVar[Optional[str]] = ContextVar("run_id", default=None)
+_RUN_PINNED: ContextVar[bool] = ContextVar("run_pinned", default=False)
+
+def begin_run(run_id: Optional[str] = None, pin: bool = False) -> str:
+    """Start a run in the current context (a fresh id unless a caller pinned one).
+
+    ``pin=True`` (e.g. a job using its job id) keeps the id across the
+    ``process_notes`` calls made on its behalf.
+    """
+    if _RUN_PINNED.get() and not pin:
+        return _RUN_ID.get()
+    run_id = run_id or uuid.uuid4().hex[:12]
+    _RUN_ID.set(run_id)
+    _RUN_PINNED.set(pin)
+    return run_id
 
 def log_event(event_type: str, data: Dict[str, Any], error: Optional[str] = None):
-    """Log structured events to JSONL."""
+    """Log structured events to JSONL (serialized and written off the event loop)."""
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
+        "run_id": _RUN_ID.get(),
         "event_type": event_type,
         **data
     }
     if error:
         log_entry["error"] = error
-    logger.info(json.dumps(log_entry))
+    get_writer().emit(log_entry)
 
 class ModelBadJSON(Exception): ...
 class ModelLowConfidence(Exception): ...
 class HallucationDetected(Exception): ...
+class ModelUnavailable(Exception): ...
+
+RETRYABLE = (ModelBadJSON, ModelLowConfidence, HallucationDetected)
+
+# A truncation repair is only trusted when the object it produced is complete.
+EXTRACTION_FIELDS = frozenset(Extraction.model_fields)
+
+def _incomplete_repair(obj: Dict[str, Any], repair: Optional[str]) -> bool:
+    return repair == "truncation" and not EXTRACTION_FIELDS <= obj.keys()
+
+def _on_breaker_change(previous: str, state: str) -> None:
+    BREAKER_TRANSITIONS.inc(state)
+    log_event("breaker_state", {"from": previous, "to": state})
+
+def model_breaker() -> CircuitBreaker:
+    """The process-wide model circuit breaker (state changes are logged)."""
+    return get_breaker(on_change=_on_breaker_change)
+
+async def _guarded(call):
+    """Run one model request through the circuit breaker."""
+    breaker = model_breaker()
+    if not breaker.allow():
+        raise CircuitOpen("model circuit open")
+    try:
+        raw = await call()
+    except Exception as e:
+        breaker.record_failure()
+        raise ModelUnavailable(str(e)) from e
+    except BaseException:
+        # Cancelled (client gone, deadline): no verdict, but free a half-open probe.
+        breaker.release()
+        raise
+    breaker.record_success()
+    return raw
 
 async def call_model_with_prompt(text: str, attempt: int = 1) -> Dict[str, Any]:
     """Call model with optional stricter instructions on retries."""
     client = await get_client()
-    raw = await client.extract(text)
+    with stage("model_call"):
+        raw = await _guarded(lambda: client.extract(text))
     try:
-        out = json.loads(raw)
+        with stage("json_parse"):
+            out, repair = parse_model_json(raw)
     except json.JSONDecodeError as e:
         raise ModelBadJSON(str(e))
+    if repair:
+        log_event("json_repaired", {"repair": repair})
+    if not isinstance(out, dict):
+        raise ModelBadJSON(f"expected a JSON object, got {type(out).__name__}")
+    if _incomplete_repair(out, repair):
+        raise ModelBadJSON("truncated output is missing extraction fields")
     return out
 
 def detect_hallucinations(obj: Dict[str, Any], original_text: str) -> bool:
     """Detect hallucinations (e.g., 'inspection' not in original text)."""
     service_intents = obj.get("service_intent", [])
-    text_lower = original_text.lower()
     
     # Check for spurious 'inspection' that wasn't in input
-    if "inspection" in service_intents and "inspection" not in text_lower and "inspect" not in text_lower:
+    if "inspection" in service_intents and not scan(original_text).has("inspect"):
         return True
     
     return False
@@ -60,11 +114,9 @@ def detect_hallucinations(obj: Dict[str, Any], original_text: str) -> bool:
 def calibrate_confidence(obj: Dict[str, Any], original_text: str) -> Dict[str, Any]:
     """Apply calibration heuristics to confidence scores."""
     confidence = float(obj.get("raw_extraction_confidence", 0.5))
-    text_lower = original_text.lower()
     
     # Down-weight if no strong evidence
-    strong_signals = ["check engine", "brak", "battery", "tire", "oil", "ac"]
-    has_strong_signal = any(sig in text_lower for sig in strong_signals)
+    has_strong_signal = scan(original_text).calibration_signal
     
     # Down-weight if only 'unknown' intent
     if obj.get("service_intent") == ["unknown"]:
@@ -81,38 +133,184 @@ def calibrate_confidence(obj: Dict[str, Any], original_text: str) -> Dict[str, A
     obj["raw_extraction_confidence"] = round(confidence, 2)
     return obj
 
+def _should_retry(retry_state) -> bool:
+    """Always retry bad answers; retry endpoint failures while the shared budget allows it."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RETRYABLE):
+        return True
+    if not isinstance(exc, ModelUnavailable):
+        return False
+    if not get_retry_budget().try_spend():
+        log_event("retry_budget_exhausted", {"error_type": type(exc).__name__})
+        return False
+    return True
+
+def _log_retry(retry_state) -> None:
+    exc = retry_state.outcome.exception()
+    MODEL_RETRIES.inc(type(exc).__name__)
+    log_event("model_retry", {"attempt": retry_state.attempt_number,
+                              "error_type": type(exc).__name__})
+
 @retry(reraise=True,
-       retry=retry_if_exception_type((ModelBadJSON, ModelLowConfidence, HallucationDetected)),
+       retry=_should_retry,
        stop=stop_after_attempt(3),
-       wait=wait_exponential(multiplier=0.2, min=0.2, max=1.5))
+       wait=wait_exponential(multiplier=0.2, min=0.2, max=1.5),
+       before_sleep=_log_retry)
 async def robust_extract(text: str, attempt: int = 1) -> Dict[str, Any]:
     obj = await call_model_with_prompt(text, attempt=attempt)
-    
+    obj = check_extraction(obj, text)
+    get_retry_budget().deposit()
+    return obj
+
+def check_extraction(obj: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Reject hallucinated / low-confidence model output, then calibrate it."""
     # Check for hallucinations
-    if detect_hallucinations(obj, text):
+    with stage("hallucination_check"):
+        hallucinated = detect_hallucinations(obj, text)
+    if hallucinated:
         raise HallucationDetected("spurious 'inspection' intent detected")
     
     confidence = float(obj.get("raw_extraction_confidence", 0.0))
-    strong_signal = any(k in text.lower() for k in ["check engine", "brak", "battery", "tire", "oil"])
+    strong_signal = scan(text).strong_signal
     
     # Retry if low confidence without strong signal
     if confidence < 0.6 and not strong_signal:
         raise ModelLowConfidence(f"low confidence: {confidence}")
     
     # Apply calibration
-    obj = calibrate_confidence(obj, text)
+    with stage("calibration"):
+        obj = calibrate_confidence(obj, text)
     return obj
 
+async def cached_extract(text: str) -> Dict[str, Any]:
+    """``robust_extract`` behind the content-addressed extraction cache."""
+    key = cache_key(text, model_name(), PROMPT_VERSION)
+    return await get_cache().get_or_compute(key, lambda: robust_extract(text))
+
+# Character budget for one packed prompt; a max-length (2000-char) note fills a third of it.
+BATCH_CHAR_BUDGET = int(os.getenv("BATCH_CHAR_BUDGET", "6000"))
+
+def plan_batches(texts: List[str], max_items: int,
+                 char_budget: int = BATCH_CHAR_BUDGET) -> List[List[int]]:
+    """Greedily pack text indices into batches bounded by item count and total length."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    size = 0
+    for i, t in enumerate(texts):
+        if current and (len(current) >= max_items or size + len(t) > char_budget):
+            batches.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += len(t)
+    if current:
+        batches.append(current)
+    return batches
+
+async def extract_batch(texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """One packed model call for several notes.
+
+    Returns a checked extraction per input position, or ``None`` for items
+    that were missing, unparseable, or failed validation; callers re-run
+    those through the single-note path.
+    """
+    out: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    try:
+        client = await get_client()
+        with stage("model_call_batch"):
+            raw = await _guarded(lambda: client.extract_batch(texts))
+        with stage("json_parse"):
+            items, repair = parse_model_json(raw)
+        if repair:
+            log_event("json_repaired", {"repair": repair, "batch_size": len(texts)})
+    except json.JSONDecodeError as e:
+        log_event("batch_extraction", {"batch_size": len(texts), "parsed": 0}, error=str(e))
+        return out
+    except Exception as e:
+        log_event("batch_extraction", {"batch_size": len(texts), "parsed": 0,
+                                       "error_type": type(e).__name__}, error=str(e))
+        return out
+    
+    checked: Dict[int, Dict[str, Any]] = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        i = item.pop("index", None)
+        if not isinstance(i, int) or not 0 <= i < len(texts) or i in checked:
+            continue
+        if _incomplete_repair(item, repair):
+            continue
+        try:
+            checked[i] = check_extraction(item, texts[i])
+        except (ModelLowConfidence, HallucationDetected, ValueError, TypeError):
+            continue
+    with stage("validation_batch"):
+        validated = validate_extractions(list(checked.values()))
+    for i, valid in zip(checked, validated):
+        if valid is not None:
+            out[i] = valid[0].model_dump()
+    
+    parsed = sum(o is not None for o in out)
+    get_retry_budget().deposit(parsed)
+    log_event("batch_extraction", {"batch_size": len(texts), "parsed": parsed,
+                                   "rerun": len(texts) - parsed})
+    return out
+
+async def _prefetch_batches(notes: List[str], batch_size: int,
+                            concurrency: int) -> Dict[int, Dict[str, Any]]:
+    """Resolve uncached notes with packed prompts; keyed by input index."""
+    cache = get_cache()
+    model, by_key = model_name(), {}
+    for idx, text in enumerate(notes):
+        clean_redacted = redact(text.strip()[:2000])
+        if rule_first_extract(clean_redacted) is not None:
+            continue
+        key = cache_key(clean_redacted, model, PROMPT_VERSION)
+        if cache.memory.get(key) is None:
+            by_key.setdefault(key, (clean_redacted, []))[1].append(idx)
+    
+    keys = list(by_key)
+    texts = [by_key[k][0] for k in keys]
+    sem = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run(batch: List[int]) -> List[Optional[Dict[str, Any]]]:
+        async with sem:
+            return await extract_batch([texts[j] for j in batch])
+    
+    batches = plan_batches(texts, batch_size)
+    prefetched: Dict[int, Dict[str, Any]] = {}
+    for batch, objs in zip(batches, await asyncio.gather(*(run(b) for b in batches))):
+        for j, obj in zip(batch, objs):
+            if obj is None:
+                continue
+            await cache.put(keys[j], obj)
+            for idx in by_key[keys[j]][1]:
+                prefetched[idx] = obj
+    return prefetched
+
+# Notes whose rule coverage reaches this score skip the model entirely (> 1 disables).
+RULE_FIRST_THRESHOLD = float(os.getenv("RULE_FIRST_THRESHOLD", "1.0"))
+
+def rule_first_extract(text: str, threshold: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Rule-based extraction for notes the rules fully cover, else ``None`` (escalate)."""
+    threshold = RULE_FIRST_THRESHOLD if threshold is None else threshold
+    sig = scan(text)
+    score = rule_coverage(sig, text)
+    if score < threshold:
+        return None
+    return {
+        "vin_detected": sig.vin_detected,
+        "vehicle_make": sig.make,
+        "vehicle_model": sig.model,
+        "year": sig.year,
+        "service_intent": sig.intents(),
+        "urgency": "medium",
+        "raw_extraction_confidence": round(0.6 + 0.3 * score, 2),
+        "notes": None
+    }
+
 async def fallback_rule_based(text: str) -> Dict[str, Any]:
-    t = text.lower()
-    intents = []
-    if "oil" in t: intents.append("oil_change")
-    if "tire" in t: intents.append("tire_rotation" if "rotation" in t else "tire_pressure")
-    if "battery" in t: intents.append("battery")
-    if "brak" in t: intents.append("brake_service")
-    if "ac" in t or "a/c" in t: intents.append("ac_service")
-    if "check engine" in t or "check-engine" in t: intents.append("engine_diagnostic")
-    if not intents: intents = ["unknown"]
+    with stage("fallback"):
+        intents = scan(text).intents(tire_prefers="tire_rotation")
     return {
         "vin_detected": False,
         "vehicle_make": None,
@@ -124,26 +322,39 @@ async def fallback_rule_based(text: str) -> Dict[str, Any]:
         "notes": "fallback_rule_based"
     }
 
-async def process_notes(notes: List[str]) -> List[Dict[str, Any]]:
-    """Process a batch of service notes with full error handling and logging."""
-    results: List[Dict[str, Any]] = []
+async def _process_one(idx: int, text: str,
+                       prefetched: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run a single note through extraction, fallback and validation.
+
+    ``prefetched`` is an already-checked extraction from a packed batch call.
+    """
+    original_text = text.strip()
+    clean = original_text[:2000]
+    with stage("redaction"):
+        clean_redacted, redactions = redact_with_spans(clean)
     
-    for idx, text in enumerate(notes):
-        original_text = text.strip()
-        clean = original_text[:2000]
-        clean_redacted = redact(clean)
-        
-        log_event("extraction_start", {"input_idx": idx, "input_length": len(original_text)})
-        
-        extraction_method = "model"
-        obj = None
-        error_trace = None
-        
+    log_event("extraction_start", {"input_idx": idx, "input_length": len(original_text),
+                                   "redactions": [list(r) for r in redactions]})
+    
+    extraction_method = "model"
+    obj = rule_first_extract(clean_redacted) if prefetched is None else None
+    error_trace = None
+    
+    if obj is not None:
+        extraction_method = "rules"
+        log_event("extraction_success", 
+                 {"input_idx": idx, "method": extraction_method, 
+                  "confidence": obj.get("raw_extraction_confidence")})
+    else:
         try:
-            obj = await robust_extract(clean_redacted)
+            if prefetched is not None:
+                obj = dict(prefetched)
+            else:
+                obj = await cached_extract(clean_redacted)
             log_event("extraction_success", 
                      {"input_idx": idx, "method": extraction_method, 
-                      "confidence": obj.get("raw_extraction_confidence")})
+                      "confidence": obj.get("raw_extraction_confidence"),
+                      "batched": prefetched is not None})
         except (ModelBadJSON, ModelLowConfidence, HallucationDetected) as e:
             error_trace = str(e)
             log_event("extraction_retry_failed", 
@@ -156,26 +367,88 @@ async def process_notes(notes: List[str]) -> List[Dict[str, Any]]:
                      {"input_idx": idx, "error_type": type(e).__name__}, error=error_trace)
             extraction_method = "fallback"
             obj = await fallback_rule_based(clean_redacted)
-        
-        try:
-            ex, warnings = validate_extraction(obj)
-            if warnings:
-                log_event("validation_warning", 
-                         {"input_idx": idx, "warnings": warnings})
-        except Exception as e:
-            log_event("validation_failed", 
-                     {"input_idx": idx, "error_type": type(e).__name__}, error=str(e))
-            # Final fallback: use fallback + re-validate
-            obj = await fallback_rule_based(clean_redacted)
+    
+    try:
+        with stage("validation"):
             ex, warnings = validate_extraction(obj)
-        
-        result = ex.model_dump()
-        result["_extraction_method"] = extraction_method
-        results.append(result)
-        
-        log_event("extraction_complete", 
-                 {"input_idx": idx, "method": extraction_method, 
-                  "intents": result["service_intent"], 
-                  "confidence": result["raw_extraction_confidence"]})
+        if warnings:
+            log_event("validation_warning", 
+                     {"input_idx": idx, "warnings": warnings})
+    except Exception as e:
+        log_event("validation_failed", 
+                 {"input_idx": idx, "error_type": type(e).__name__}, error=str(e))
+        # Final fallback: use fallback + re-validate
+        obj = await fallback_rule_based(clean_redacted)
+        ex, warnings = validate_extraction(obj)
+    
+    result = ex.model_dump()
+    result["_extraction_method"] = extraction_method
+    EXTRACTIONS.inc(extraction_method)
+    
+    log_event("extraction_complete", 
+             {"input_idx": idx, "method": extraction_method, 
+              "intents": result["service_intent"], 
+              "confidence": result["raw_extraction_confidence"]})
+    return result
+
+async def _iter_chunk(notes: List[str], start: int, concurrency: int,
+                      batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+    """Yield results for one chunk of notes in input order as each becomes ready."""
+    prefetched: Dict[int, Dict[str, Any]] = {}
+    if batch_size > 1:
+        prefetched = await _prefetch_batches(notes, batch_size, concurrency)
+    
+    if concurrency <= 1:
+        for i, text in enumerate(notes):
+            yield await _process_one(start + i, text, prefetched.get(i))
+        return
     
+    sem = asyncio.Semaphore(concurrency)
+    
+    async def bounded(i: int, text: str) -> Dict[str, Any]:
+        async with sem:
+            return await _process_one(start + i, text, prefetched.get(i))
+    
+    tasks = [asyncio.create_task(bounded(i, text)) for i, text in enumerate(notes)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def process_notes(notes: List[str], concurrency: int = 1,
+                        batch_size: int = 1) -> List[Dict[str, Any]]:
+    """Process a batch of service notes with full error handling and logging.
+
+    ``concurrency`` caps how many notes (or packed prompts) are in flight at
+    once; ``batch_size`` > 1 packs up to that many notes per model request and
+    re-runs only the items that come back unusable. Results are always
+    returned in input order.
+    """
+    begin_run()
+    results = [r async for r in _iter_chunk(notes, 0, concurrency, batch_size)]
+    log_event("cache_stats", {"batch_size": len(notes), **get_cache().stats()})
     return results
+
+async def stream_notes(notes: Iterable[str], concurrency: int = 1, batch_size: int = 1,
+                       start: int = 0, chunk_size: Optional[int] = None
+                       ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Streaming counterpart of ``process_notes`` for unbounded inputs.
+
+    Pulls ``chunk_size`` notes at a time from ``notes`` so memory stays
+    bounded, and yields ``(input_idx, result)`` pairs in input order.
+    ``start`` offsets ``input_idx`` when resuming part-way through an input.
+    """
+    begin_run()
+    chunk_size = chunk_size or max(64, 2 * concurrency * batch_size)
+    it = iter(notes)
+    idx = start
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            break
+        async for result in _iter_chunk(chunk, idx, concurrency, batch_size):
+            yield idx, result
+            idx += 1
+    log_event("cache_stats", {"batch_size": idx - start, **get_cache().stats()})
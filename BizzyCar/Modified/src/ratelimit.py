@@ -0,0 +1,271 @@
+"""Adaptive (AIMD) concurrency and request-rate limits for model calls, per model.
+
+Each model gets a controller that raises its in-flight limit and request rate
+additively while calls succeed at normal latency, and cuts both
+multiplicatively on a 429 / overload response or when latency climbs far
+above the best recently seen. Throttled calls wait out ``Retry-After`` and are
+retried here, so they reach the extraction fallback only if the provider keeps
+refusing. Transient failures (connection errors, timeouts, 408/409/500/502/504)
+are retried here too, the way the SDK's own retries would, since the SDK's are
+turned off while a controller is in charge.
+"""
+import asyncio, email.utils, math, os, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import httpx
+from .metrics import RATE_LIMIT_EVENTS
+
+try:
+    from openai import APIConnectionError
+except ImportError:
+    APIConnectionError = ()
+
+T = TypeVar("T")
+
+OVERLOAD_STATUS = (503, 529)
+TRANSIENT_STATUS = (408, 409, 500, 502, 504)
+
+class RateLimited(Exception):
+    """The provider refused a call for rate (``rate_limited``) or load (``overloaded``) reasons."""
+    def __init__(self, message: str, kind: str = "rate_limited", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    """Seconds to wait from ``retry-after-ms`` or ``retry-after`` (delay or HTTP date)."""
+    if not headers:
+        return None
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms:
+            return max(0.0, float(ms) / 1000.0)
+    except ValueError:
+        pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+def as_rate_limited(exc: BaseException) -> Optional[RateLimited]:
+    """``exc`` as a ``RateLimited`` if it is a 429 or overload response, else ``None``."""
+    if isinstance(exc, RateLimited):
+        return exc
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status == 429:
+        kind = "rate_limited"
+    elif status in OVERLOAD_STATUS or "overloaded" in str(exc).lower():
+        kind = "overloaded"
+    else:
+        return None
+    return RateLimited(str(exc), kind, parse_retry_after(getattr(response, "headers", None)))
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether ``exc`` is a connection error, timeout or retryable 408/409/5xx response."""
+    if isinstance(exc, (APIConnectionError, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status in TRANSIENT_STATUS
+
+class AIMDController:
+    """In-flight and requests/s limits for one model.
+
+    Until the first cut both limits grow by 1 per success (doubling per round
+    of calls, like TCP slow start). After that a success at normal latency
+    adds ``1 / limit`` to the in-flight limit and ``1 / rate`` to the rate,
+    about +1 per round. A 429 multiplies both by ``backoff``, an overload
+    (provider-wide, not our quota) by ``overload_backoff``, and either holds
+    new calls until ``Retry-After`` (or ``default_wait``) has passed; latency
+    above ``slow_factor`` x the baseline multiplies them by ``slow_backoff``.
+    The baseline is kept per call size (``items``), so a packed request is
+    only compared with other requests of the same size. Calls sent before the
+    last cut cannot cut again, so a burst of 429s halves the limits once.
+    """
+    def __init__(self, model: str, max_concurrency: int = 32, max_rps: float = 50.0,
+                 initial_concurrency: int = 4, initial_rps: float = 10.0,
+                 min_concurrency: int = 1, min_rps: float = 0.5, max_attempts: int = 6,
+                 backoff: float = 0.5, overload_backoff: float = 0.8,
+                 slow_factor: float = 3.0, slow_backoff: float = 0.9,
+                 default_wait: float = 1.0, transient_retries: int = 2, transient_backoff: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.model = model
+        self.max_concurrency, self.min_concurrency = max_concurrency, min_concurrency
+        self.max_rps, self.min_rps = max_rps, min_rps
+        self.max_attempts = max_attempts
+        self.backoff, self.overload_backoff = backoff, overload_backoff
+        self.slow_factor, self.slow_backoff = slow_factor, slow_backoff
+        self.default_wait = default_wait
+        self.transient_retries, self.transient_backoff = transient_retries, transient_backoff
+        self.clock = clock
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.rate = float(min(max(initial_rps, min_rps), max_rps))
+        self.in_flight = 0
+        self.tokens = 1.0
+        self.refilled_at = clock()
+        self.blocked_until = 0.0
+        self.cut_at = -math.inf
+        self.baselines: Dict[int, float] = {}
+        self.throttled = 0
+        self.slow_start = True
+        self._waiters: List["asyncio.Future[None]"] = []
+
+    def _delay(self, now: float) -> Optional[float]:
+        """0 if a call may start now, else seconds to sleep, or None to wait for a release."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        # Token bucket holding at most one second of requests.
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    async def acquire(self) -> float:
+        """Wait for a slot and a token; returns the send time for ``release``."""
+        while True:
+            now = self.clock()
+            delay = self._delay(now)
+            if delay == 0.0:
+                self.in_flight += 1
+                self.tokens -= 1.0
+                return now
+            if delay is not None:
+                await asyncio.sleep(delay)
+                continue
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def _cut(self, sent_at: float, now: float, factor: float) -> None:
+        if sent_at < self.cut_at:
+            return
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+        self.rate = max(self.min_rps, self.rate * factor)
+        self.tokens = min(self.tokens, 1.0)
+        self.cut_at = now
+        self.slow_start = False
+
+    def release(self, sent_at: float, latency: Optional[float] = None,
+                throttled: Optional[RateLimited] = None, items: int = 1) -> None:
+        """Record a finished call: ``latency`` on success, ``throttled`` on a 429 /
+        overload, neither for other failures (they leave the limits alone).
+        ``items`` is the number of notes the call carried."""
+        self.in_flight -= 1
+        now = self.clock()
+        if throttled is not None:
+            self.throttled += 1
+            RATE_LIMIT_EVENTS.inc(throttled.kind)
+            wait = throttled.retry_after if throttled.retry_after is not None else self.default_wait
+            self.blocked_until = max(self.blocked_until, now + wait)
+            self._cut(sent_at, now, self.backoff if throttled.kind == "rate_limited" else self.overload_backoff)
+        elif latency is not None:
+            # Baseline follows the fastest recent calls of this size, drifting up 2% per sample.
+            baseline = self.baselines.get(items)
+            baseline = self.baselines[items] = latency if baseline is None else min(latency, baseline * 1.02)
+            if latency > self.slow_factor * baseline:
+                RATE_LIMIT_EVENTS.inc("slow")
+                self._cut(sent_at, now, self.slow_backoff)
+            else:
+                grow = (lambda value: 1.0) if self.slow_start else (lambda value: 1.0 / value)
+                self.limit = min(float(self.max_concurrency), self.limit + grow(self.limit))
+                self.rate = min(self.max_rps, self.rate + grow(self.rate))
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def call(self, request: Callable[[], Awaitable[T]], items: int = 1) -> T:
+        """Run ``request`` within the limits.
+
+        Throttled attempts are retried up to ``max_attempts`` tries; transient
+        failures get ``transient_retries`` retries with exponential backoff.
+        """
+        attempt = retried = 0
+        while True:
+            attempt += 1
+            sent_at = await self.acquire()
+            try:
+                result = await request()
+            except Exception as e:
+                throttled = as_rate_limited(e)
+                self.release(sent_at, throttled=throttled)
+                if throttled is None:
+                    if not is_transient(e) or retried >= self.transient_retries:
+                        raise
+                    retried += 1
+                    RATE_LIMIT_EVENTS.inc("transient")
+                    await asyncio.sleep(min(8.0, self.transient_backoff * 2 ** (retried - 1)))
+                    continue
+                if attempt >= self.max_attempts:
+                    RATE_LIMIT_EVENTS.inc("exhausted")
+                    raise throttled from e
+                continue
+            except BaseException:
+                self.release(sent_at)
+                raise
+            self.release(sent_at, latency=self.clock() - sent_at, items=items)
+            return result
+
+    def status(self) -> Dict[str, object]:
+        return {"concurrency_limit": round(self.limit, 2), "rps_limit": round(self.rate, 2),
+                "in_flight": self.in_flight, "throttled": self.throttled,
+                "blocked_for_s": round(max(0.0, self.blocked_until - self.clock()), 3)}
+
+_controllers: Dict[str, AIMDController] = {}
+
+def _model_limits() -> Dict[str, Tuple[int, float]]:
+    """``RATE_LIMIT_MODELS="gpt-4o-mini=16:40,gpt-4=4:5"`` -> {model: (concurrency, rps)}."""
+    limits: Dict[str, Tuple[int, float]] = {}
+    for entry in os.getenv("RATE_LIMIT_MODELS", "").split(","):
+        model, _, spec = entry.strip().rpartition("=")
+        concurrency, _, rps = spec.partition(":")
+        if model and concurrency:
+            limits[model] = (int(concurrency), float(rps or os.getenv("RATE_LIMIT_MAX_RPS", "50")))
+    return limits
+
+def get_rate_limiter(model: str) -> Optional[AIMDController]:
+    """Process-wide controller for ``model``, or ``None`` when disabled.
+
+    Controls via environment variables:
+      RATE_LIMIT_ENABLED (default true)
+      RATE_LIMIT_MAX_CONCURRENCY (default 32 in-flight calls per model)
+      RATE_LIMIT_MAX_RPS (default 50 requests/s per model)
+      RATE_LIMIT_MODELS (per-model caps as model=concurrency:rps, comma-separated)
+      RATE_LIMIT_INITIAL_CONCURRENCY (default 4)
+      RATE_LIMIT_INITIAL_RPS (default 10)
+      RATE_LIMIT_MAX_ATTEMPTS (default 6 tries per call while throttled)
+      RATE_LIMIT_TRANSIENT_RETRIES (default 2 retries of connection errors, timeouts and 5xx)
+    """
+    if os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "true":
+        return None
+    controller = _controllers.get(model)
+    if controller is None:
+        max_concurrency, max_rps = _model_limits().get(
+            model, (int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "32")), float(os.getenv("RATE_LIMIT_MAX_RPS", "50"))))
+        controller = _controllers[model] = AIMDController(
+            model, max_concurrency=max_concurrency, max_rps=max_rps,
+            initial_concurrency=int(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", "4")),
+            initial_rps=float(os.getenv("RATE_LIMIT_INITIAL_RPS", "10")),
+            max_attempts=int(os.getenv("RATE_LIMIT_MAX_ATTEMPTS", "6")),
+            transient_retries=int(os.getenv("RATE_LIMIT_TRANSIENT_RETRIES", "2")),
+        )
+    return controller
+
+def rate_limit_status() -> Dict[str, Dict[str, object]]:
+    return {model: c.status() for model, c in _controllers.items()}
+
+def reset_rate_limiters() -> None:
+    """Drop every controller (rebuilt from env on next use)."""
+    _controllers.clear()
@@ -0,0 +1,92 @@
+import re
+from typing import Callable, Iterator, List, NamedTuple, Tuple
+
+# Same matches as the original two passes:
+#   email  [A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}
+#   phone  \+?\d[\d\-\s]{7,}\d   (run on the text left after emails)
+# but found by anchored, non-backtracking scans so a 2000-char run of
+# local-part characters or dots costs O(n) instead of O(n^2).
+LOCAL_RUN = re.compile(r"[A-Za-z0-9._%+-]*")
+DOMAIN_RUN = re.compile(r"[A-Za-z0-9.-]+")
+LETTERS = re.compile(r"[A-Za-z]+")
+TLD_REVERSED = re.compile(r"[A-Za-z]{2}\.")
+PHONE_START = re.compile(r"\d[\d\-\s]{7}")
+DIGIT_SPAN = re.compile(r"\d(?:[\-\s]*\d)*")
+
+PLACEHOLDERS = {"email": "<redacted_email>", "phone": "<redacted_phone>"}
+
+class Redaction(NamedTuple):
+    """A redacted span ``[start, end)`` of the input text (offsets only, never the value)."""
+    start: int
+    end: int
+    kind: str
+
+Detector = Callable[[str, int, int], Iterator[Tuple[int, int]]]
+
+def _emails(text: str, lo: int, hi: int) -> Iterator[Tuple[int, int]]:
+    rev = None
+    q = text.find("@", lo, hi)
+    while q != -1:
+        if rev is None:
+            rev = text[::-1]
+        # Local part: the run of local characters ending at '@', read backwards.
+        r = len(text) - q
+        start = q - (LOCAL_RUN.match(rev, r, len(text) - lo).end() - r)
+        domain = DOMAIN_RUN.match(text, q + 1, hi) if start < q else None
+        if domain is not None:
+            # Greedy domain backtracks to the last '.' followed by 2+ letters,
+            # i.e. the first "xx." in the reversed domain.
+            n = len(text)
+            tld = TLD_REVERSED.search(rev, n - domain.end(), n - q - 2)
+            if tld is not None:
+                end = LETTERS.match(text, n - tld.start() - 2).end()
+                yield start, end
+                lo = end
+        q = text.find("@", max(q + 1, lo), hi)
+
+def _phones(text: str, lo: int, hi: int) -> Iterator[Tuple[int, int]]:
+    # A digit followed by 7 run characters can only be the first digit of its
+    # run; the span then ends at the run's last digit (9+ chars to count).
+    m = PHONE_START.search(text, lo, hi)
+    while m is not None:
+        s = m.start()
+        e = DIGIT_SPAN.match(text, s, hi).end()
+        if e - s >= 9:
+            yield (s - 1 if s > lo and text[s - 1] == "+" else s), e
+        m = PHONE_START.search(text, e, hi)
+
+# Earlier detectors win; later ones only see the gaps between earlier spans.
+DETECTORS: List[Tuple[str, Detector]] = [("email", _emails), ("phone", _phones)]
+
+def find_pii(text: str) -> List[Redaction]:
+    """All PII spans in ``text``, sorted by offset."""
+    found: List[Redaction] = []
+    gaps = [(0, len(text))]
+    for kind, detect in DETECTORS:
+        remaining = []
+        for lo, hi in gaps:
+            pos = lo
+            for s, e in detect(text, lo, hi):
+                found.append(Redaction(s, e, kind))
+                remaining.append((pos, s))
+                pos = e
+            remaining.append((pos, hi))
+        gaps = remaining
+    found.sort()
+    return found
+
+def redact_with_spans(text: str) -> Tuple[str, List[Redaction]]:
+    """Redacted text plus the original-text offsets of what was replaced."""
+    spans = find_pii(text)
+    if not spans:
+        return text, spans
+    parts, pos = [], 0
+    for s, e, kind in spans:
+        parts.append(text[pos:s])
+        parts.append(PLACEHOLDERS[kind])
+        pos = e
+    parts.append(text[pos:])
+    return "".join(parts), spans
+
+def redact(text: str) -> str:
+    return redact_with_spans(text)[0]
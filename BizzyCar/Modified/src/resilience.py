@@ -0,0 +1,135 @@
+import os, time
+from typing import Callable, Dict, Optional
+
+class CircuitOpen(Exception): ...
+
+class RetryBudget:
+    """Batch-wide token bucket for retrying endpoint failures.
+
+    Every successful model extraction (single or packed) deposits ``ratio``
+    tokens (up to ``capacity``) and every retry of a timeout / 5xx / 429
+    spends one, so sustained endpoint retries are capped at roughly ``ratio``
+    per success. When the endpoint degrades the bucket drains and notes go
+    straight to fallback instead of each paying for every attempt. Retries
+    for bad answers (hallucinations, low confidence, bad JSON) do not spend.
+    """
+    def __init__(self, ratio: float = 0.2, capacity: float = 10.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+        self.denied = 0
+
+    def deposit(self, n: int = 1) -> None:
+        self.tokens = min(self.capacity, self.tokens + n * self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.denied += 1
+        return False
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker around the model client.
+
+    Opens after ``failure_threshold`` consecutive call failures. While open,
+    calls are rejected with ``CircuitOpen`` until ``reset_timeout`` elapses;
+    then up to ``half_open_probes`` calls are let through and the first
+    result decides between closing and re-opening.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0,
+                 half_open_probes: int = 1,
+                 on_change: Optional[Callable[[str, str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.on_change = on_change
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        previous, self.state = self.state, state
+        if state == self.OPEN:
+            self.opened_at = self.clock()
+        if state != self.HALF_OPEN:
+            self.probes_in_flight = 0
+        if self.on_change:
+            self.on_change(previous, state)
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now (counts half-open probes)."""
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and self.probes_in_flight < self.half_open_probes:
+            self.probes_in_flight += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        """Give back a call's probe slot without a verdict (the call was cancelled)."""
+        if self.state == self.HALF_OPEN and self.probes_in_flight:
+            self.probes_in_flight -= 1
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._transition(self.OPEN)
+            self.opened_at = self.clock()
+
+    def status(self) -> Dict[str, object]:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures}
+
+_breaker: Optional[CircuitBreaker] = None
+_budget: Optional[RetryBudget] = None
+
+def get_breaker(on_change: Optional[Callable[[str, str], None]] = None) -> CircuitBreaker:
+    """Process-wide model breaker.
+
+    Controls via environment variables:
+      BREAKER_FAILURE_THRESHOLD (default 5 consecutive failures)
+      BREAKER_RESET_SECONDS (default 10)
+      BREAKER_HALF_OPEN_PROBES (default 1)
+    """
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("BREAKER_RESET_SECONDS", "10")),
+            half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1")),
+            on_change=on_change,
+        )
+    return _breaker
+
+def get_retry_budget() -> RetryBudget:
+    """Process-wide retry budget.
+
+    Controls via environment variables:
+      RETRY_BUDGET_RATIO (default 0.2 endpoint retries earned per successful extraction)
+      RETRY_BUDGET_CAPACITY (default 10 banked retries)
+    """
+    global _budget
+    if _budget is None:
+        _budget = RetryBudget(
+            ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")),
+            capacity=float(os.getenv("RETRY_BUDGET_CAPACITY", "10")),
+        )
+    return _budget
+
+def reset_resilience() -> None:
+    """Drop the process-wide breaker and budget (they are rebuilt from env on next use)."""
+    global _breaker, _budget
+    _breaker = _budget = None
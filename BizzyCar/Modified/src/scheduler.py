@@ -0,0 +1,146 @@
+import asyncio, os
+from typing import Any, Dict, List, Optional
+from .processing import log_event, process_notes
+
+class SchedulerStopped(RuntimeError):
+    """The scheduler shut down before a queued note was processed."""
+
+class _Item:
+    __slots__ = ("text", "future")
+
+    def __init__(self, text: str, future: "asyncio.Future[Dict[str, Any]]"):
+        self.text = text
+        self.future = future
+
+class BatchScheduler:
+    """Coalesces notes from concurrent ``/analyze`` requests into shared batches.
+
+    A batch is dispatched ``window`` seconds after its first note arrives, or
+    as soon as it holds ``max_batch`` notes. Each dispatched batch goes through
+    ``process_notes`` (so it shares cache lookups, de-duplication and packed
+    prompts) and every result is routed back to its caller's future. Notes
+    whose caller has given up (deadline or disconnect) before dispatch are
+    dropped from the batch, and a dispatch whose callers have all given up is
+    cancelled. On ``stop`` unfinished callers get ``SchedulerStopped``.
+    """
+    def __init__(self, window: float = 0.01, max_batch: int = 64,
+                 concurrency: int = 8, batch_size: int = 1):
+        self.window = window
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._queue: "asyncio.Queue[_Item]" = asyncio.Queue()
+        self._runner: Optional[asyncio.Task] = None
+        self._dispatches: "set[asyncio.Task]" = set()
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._runner, *self._dispatches] if t is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runner = None
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if not item.future.done():
+                item.future.set_exception(SchedulerStopped("scheduler stopped"))
+
+    async def submit(self, texts: List[str], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Queue notes and wait for their results (``asyncio.TimeoutError`` past ``timeout``)."""
+        loop = asyncio.get_running_loop()
+        items = [_Item(t, loop.create_future()) for t in texts]
+        for item in items:
+            self._queue.put_nowait(item)
+        try:
+            return list(await asyncio.wait_for(asyncio.gather(*(i.future for i in items)), timeout))
+        finally:
+            for item in items:
+                if not item.future.done():
+                    item.future.cancel()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            close_at = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = close_at - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            live = [i for i in batch if not i.future.done()]
+            if live:
+                task = asyncio.create_task(self._dispatch(live))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, items: List[_Item]) -> None:
+        log_event("coalesced_dispatch", {"batch_size": len(items)})
+        task = asyncio.current_task()
+        waiting = [len(items)]
+
+        def given_up(_) -> None:
+            # Results are only set after process_notes returns, so every future
+            # finishing while the task still runs means every caller has left.
+            waiting[0] -= 1
+            if not waiting[0] and not task.done():
+                log_event("coalesced_abandoned", {"batch_size": len(items)})
+                task.cancel()
+
+        for item in items:
+            item.future.add_done_callback(given_up)
+        try:
+            results = await process_notes([i.text for i in items], concurrency=self.concurrency,
+                                          batch_size=self.batch_size)
+        except Exception as e:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        except asyncio.CancelledError:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(SchedulerStopped("scheduler stopped"))
+            raise
+        for item, result in zip(items, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+_scheduler: Optional[BatchScheduler] = None
+
+def start_scheduler() -> Optional[BatchScheduler]:
+    """Create and start the process-wide scheduler if coalescing is enabled.
+
+    Controls via environment variables:
+      COALESCE_WINDOW_MS (default 0 = disabled; e.g. 10)
+      COALESCE_MAX_BATCH (default 64 notes)
+      COALESCE_CONCURRENCY (default 8 notes in flight per dispatched batch)
+      COALESCE_BATCH_SIZE (default 1; >1 packs notes into shared prompts)
+    """
+    global _scheduler
+    window_ms = float(os.getenv("COALESCE_WINDOW_MS", "0"))
+    if window_ms <= 0:
+        return None
+    _scheduler = BatchScheduler(
+        window=window_ms / 1000.0,
+        max_batch=int(os.getenv("COALESCE_MAX_BATCH", "64")),
+        concurrency=int(os.getenv("COALESCE_CONCURRENCY", "8")),
+        batch_size=int(os.getenv("COALESCE_BATCH_SIZE", "1")),
+    )
+    _scheduler.start()
+    return _scheduler
+
+def get_scheduler() -> Optional[BatchScheduler]:
+    return _scheduler
+
+async def stop_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        scheduler, _scheduler = _scheduler, None
+        await scheduler.stop()
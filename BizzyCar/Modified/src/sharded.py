@@ -0,0 +1,159 @@
+import asyncio, json, os, shutil, sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from multiprocessing import get_context
+from typing import AnyStr, Dict, Iterable, Iterator, List, Tuple
+from .jsonparse import dumps
+
+def parse_jsonl_messages(lines: Iterable[AnyStr]) -> Iterator[str]:
+    """Notes from JSONL lines: each is a string or an object with 'message'/'text'.
+
+    Raises ``ValueError`` naming the (1-based) line for invalid JSON or any
+    other kind of record.
+    """
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {n}: {e.msg}") from e
+        if isinstance(rec, str):
+            yield rec
+        elif isinstance(rec, dict):
+            yield rec.get("message", rec.get("text", ""))
+        else:
+            raise ValueError(f"line {n}: expected a string or an object with 'message'/'text', "
+                             f"got {type(rec).__name__}")
+
+def read_jsonl_messages(path: str) -> Iterator[str]:
+    """Lazily read notes from a JSONL file (see ``parse_jsonl_messages``)."""
+    with open(path, "r") as f:
+        yield from parse_jsonl_messages(f)
+
+def iter_input(path: str) -> Iterator[str]:
+    """Notes from a ``{'messages': [...]}`` JSON file or a JSONL file."""
+    if path.endswith((".jsonl", ".ndjson")):
+        yield from read_jsonl_messages(path)
+        return
+    with open(path, "r") as f:
+        yield from json.load(f).get("messages", [])
+
+def _shard_paths(work_dir: str, i: int) -> Tuple[str, str]:
+    return (os.path.join(work_dir, f"shard-{i:05d}.in.jsonl"),
+            os.path.join(work_dir, f"shard-{i:05d}.out.jsonl"))
+
+def write_shards(input_path: str, work_dir: str, shard_size: int) -> List[Dict[str, int]]:
+    """Split the input into JSONL shard files once; later runs reuse the manifest."""
+    manifest_path = os.path.join(work_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["input"] == os.path.abspath(input_path) and manifest["shard_size"] == shard_size:
+            return manifest["shards"]
+        raise ValueError(f"{work_dir} holds shards for a different input/shard size; remove it to restart")
+
+    os.makedirs(work_dir, exist_ok=True)
+    shards: List[Dict[str, int]] = []
+    notes = iter_input(input_path)
+    start = 0
+    while True:
+        chunk = list(islice(notes, shard_size))
+        if not chunk:
+            break
+        shard_in, _ = _shard_paths(work_dir, len(shards))
+        with open(shard_in, "w") as f:
+            f.writelines(json.dumps(n) + "\n" for n in chunk)
+        shards.append({"start": start, "count": len(chunk)})
+        start += len(chunk)
+    with open(manifest_path, "w") as f:
+        json.dump({"input": os.path.abspath(input_path), "shard_size": shard_size,
+                   "shards": shards}, f)
+    return shards
+
+def _worker_init() -> None:
+    # One log file per worker process unless the caller already templated the path.
+    path = os.getenv("PIPELINE_LOG_PATH", "pipeline.jsonl")
+    if "{pid}" not in path:
+        root, ext = os.path.splitext(path)
+        os.environ["PIPELINE_LOG_PATH"] = f"{root}-{{pid}}{ext}"
+
+def run_shard(shard_in: str, shard_out: str, start: int, concurrency: int, batch_size: int) -> int:
+    """Process one shard in its own event loop and model client.
+
+    Results go to a temp file that is renamed into place only when the shard
+    is complete, so the renamed file doubles as the shard's checkpoint.
+    """
+    from .model_client import close_client
+    from .processing import stream_notes
+
+    async def run() -> int:
+        tmp = shard_out + ".tmp"
+        n = 0
+        try:
+            with open(tmp, "wb") as f:
+                async for idx, item in stream_notes(read_jsonl_messages(shard_in), concurrency=concurrency,
+                                                    batch_size=batch_size, start=start):
+                    f.write(dumps({"_input_idx": idx, **item}) + b"\n")
+                    n += 1
+        finally:
+            await close_client()
+        os.replace(tmp, shard_out)
+        return n
+
+    return asyncio.run(run())
+
+def merge_shards(work_dir: str, shards: List[Dict[str, int]], output_path: str) -> int:
+    """Concatenate shard outputs in input order (JSONL, or ``{'items': [...]}`` for .json)."""
+    as_json = not output_path.endswith((".jsonl", ".ndjson"))
+    n = 0
+    with open(output_path, "wb") as out:
+        if as_json:
+            out.write(b'{"items": [')
+        for i in range(len(shards)):
+            with open(_shard_paths(work_dir, i)[1], "rb") as f:
+                for line in f:
+                    if as_json:
+                        item = json.loads(line)
+                        item.pop("_input_idx", None)
+                        out.write((b",\n" if n else b"\n") + dumps(item))
+                    else:
+                        out.write(line)
+                    n += 1
+        if as_json:
+            out.write(b"\n]}\n")
+    return n
+
+def run_sharded(input_path: str, output_path: str, workers: int, shard_size: int = 1000,
+                concurrency: int = 1, batch_size: int = 1, work_dir: str = "") -> int:
+    """Shard the input, extract shards on a process pool, and merge in original order.
+
+    Finished shards are skipped on re-runs, so a failed run resumes where it
+    stopped. The work directory is removed after a successful merge.
+    """
+    work_dir = work_dir or output_path + ".shards"
+    shards = write_shards(input_path, work_dir, shard_size)
+    pending = [i for i in range(len(shards)) if not os.path.exists(_shard_paths(work_dir, i)[1])]
+    done = len(shards) - len(pending)
+    total = sum(s["count"] for s in shards)
+    if done:
+        print(f"Resuming: {done}/{len(shards)} shards already complete", file=sys.stderr)
+
+    if pending:
+        ctx = get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_worker_init) as pool:
+            futures = {pool.submit(run_shard, *_shard_paths(work_dir, i), shards[i]["start"],
+                                   concurrency, batch_size): i for i in pending}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                n = fut.result()
+                done += 1
+                print(f"shard {i + 1}/{len(shards)} done ({n} notes); {done}/{len(shards)} complete",
+                      file=sys.stderr)
+
+    n = merge_shards(work_dir, shards, output_path)
+    if n != total:
+        raise RuntimeError(f"merged {n} results for {total} input notes; shards kept in {work_dir}")
+    shutil.rmtree(work_dir)
+    return n
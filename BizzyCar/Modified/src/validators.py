@@ -1,12 +1,30 @@
-from typing import Any, Dict, List, Tuple
-from pydantic import ValidationError
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
 from .schemas import Extraction
 
-def validate_extraction(obj: Dict[str, Any]) -> Tuple[Extraction, List[str]]:
+# Built once: constructing a TypeAdapter compiles a core schema.
+EXTRACTION_LIST = TypeAdapter(List[Extraction])
+
+def _guardrails(ex: Extraction) -> List[str]:
     warnings: List[str] = []
-    ex = Extraction.model_validate(obj)
     if not ex.service_intent:
         warnings.append("empty_service_intent")
     if ex.service_intent == ["unknown"]:
         ex.raw_extraction_confidence = min(ex.raw_extraction_confidence, 0.5)
-    return ex, warnings
+    return warnings
+
+def validate_extraction(obj: Dict[str, Any]) -> Tuple[Extraction, List[str]]:
+    ex = Extraction.model_validate(obj)
+    return ex, _guardrails(ex)
+
+def validate_extractions(objs: List[Dict[str, Any]]) -> List[Optional[Tuple[Extraction, List[str]]]]:
+    """Validate many extractions in one adapter call; invalid items come back as ``None``."""
+    try:
+        models: List[Optional[Extraction]] = list(EXTRACTION_LIST.validate_python(objs))
+    except ValidationError as e:
+        bad = {err["loc"][0] for err in e.errors() if err["loc"]}
+        if not bad:
+            raise
+        good = iter(EXTRACTION_LIST.validate_python([o for i, o in enumerate(objs) if i not in bad]))
+        models = [None if i in bad else next(good) for i in range(len(objs))]
+    return [None if ex is None else (ex, _guardrails(ex)) for ex in models]
@@ -1,4 +1,5 @@
-import json, asyncio, os, re
+import json, asyncio, math, os, re
+import pytest
 from src.processing import process_notes, redact, detect_hallucinations, calibrate_confidence
 from src.schemas import Extraction
 
@@ -101,15 +102,793 @@ def test_logging_output():
     notes = ["Quick oil change for 2020 Accord"]
     asyncio.run(process_notes(notes))
     
-    # Check if pipeline.jsonl exists and contains valid JSON lines
-    if os.path.exists('pipeline.jsonl'):
-        with open('pipeline.jsonl', 'r') as f:
-            lines = f.readlines()
-            assert len(lines) > 0, "Should have written log entries"
-            for line in lines[-5:]:  # Check last 5 lines
-                try:
-                    log_entry = json.loads(line)
-                    assert "timestamp" in log_entry
-                    assert "event_type" in log_entry
-                except json.JSONDecodeError:
-                    pass  # Some lines might be partial
+    # Check the log (PIPELINE_LOG_PATH, pointed at tmp_path by conftest) has valid JSON lines
+    from src.logsink import get_writer, log_path
+    get_writer().flush()
+    assert os.path.exists(log_path())
+    with open(log_path(), 'r') as f:
+        lines = f.readlines()
+        assert len(lines) > 0, "Should have written log entries"
+        for line in lines[-5:]:  # Check last 5 lines
+            try:
+                log_entry = json.loads(line)
+                assert "timestamp" in log_entry
+                assert "event_type" in log_entry
+            except json.JSONDecodeError:
+                pass  # Some lines might be partial
+
+def test_concurrent_processing_preserves_order():
+    """Concurrent mode returns results in input order."""
+    notes = [
+        "2018 Camry in for oil change.",
+        "Brake grinding on 2015 Accord.",
+        "Need tire rotation on 2020 Rogue.",
+        "Battery dead on F-150.",
+    ]
+    out = asyncio.run(process_notes(notes, concurrency=3))
+    assert len(out) == 4
+    assert out[0]["vehicle_model"] in ("Camry", None)
+    assert "brake_service" in out[1]["service_intent"]
+    assert "battery" in out[3]["service_intent"]
+
+def test_real_client_is_shared(monkeypatch):
+    """The real API client is built once and reused until closed."""
+    from src.model_client import get_client, close_client
+    monkeypatch.setenv("USE_REAL_API", "true")
+    monkeypatch.setenv("LLM_API_KEY", "test-key")
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:9/v1")
+
+    async def run():
+        first = await get_client()
+        second = await get_client()
+        await close_client()
+        third = await get_client()
+        await close_client()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first is second
+    assert third is not first
+
+def test_extraction_cache_coalesces_duplicates(tmp_path):
+    """Duplicate notes are computed once and served from the cache afterwards."""
+    from src.cache import ExtractionCache, LRUCache, SQLiteCache, cache_key
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"service_intent": ["oil_change"]}
+
+    cache = ExtractionCache(LRUCache(maxsize=8, ttl=60), SQLiteCache(str(tmp_path / "c.db"), ttl=60))
+    key = cache_key("oil change", "mock", "v1")
+
+    async def run():
+        first = await asyncio.gather(*(cache.get_or_compute(key, compute) for _ in range(5)))
+        again = await cache.get_or_compute(key, compute)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r == {"service_intent": ["oil_change"]} for r in first + [again])
+    assert cache.coalesced == 4 and cache.hits == 1 and cache.misses == 1
+
+    # A fresh process-level cache reads the entry back from the SQLite tier
+    cold = ExtractionCache(LRUCache(maxsize=8, ttl=60), SQLiteCache(str(tmp_path / "c.db"), ttl=60))
+    assert asyncio.run(cold.get_or_compute(key, compute)) == {"service_intent": ["oil_change"]}
+    assert len(calls) == 1 and cold.disk_hits == 1
+
+def test_plan_batches_respects_item_and_char_limits():
+    """Packed prompts are bounded by both note count and total length."""
+    from src.processing import plan_batches
+    texts = ["a" * 100] * 5 + ["b" * 2000] * 4
+    batches = plan_batches(texts, max_items=4, char_budget=4000)
+    assert [i for b in batches for i in b] == list(range(9))
+    assert all(len(b) <= 4 for b in batches)
+    assert all(sum(len(texts[i]) for i in b) <= 4000 or len(b) == 1 for b in batches)
+
+def test_batched_processing_matches_inputs():
+    """Batch mode maps packed results back by index and keeps input order."""
+    from src.cache import reset_cache
+    reset_cache()
+    notes = [
+        "2019 Camry needs oil change.",
+        "Brake squeal on 2016 Accord.",
+        "Battery replacement for 2021 F-150.",
+        "2017 Rogue tire rotation.",
+        "2019 Camry needs oil change.",
+    ]
+    out = asyncio.run(process_notes(notes, batch_size=4))
+    assert len(out) == 5
+    assert "oil_change" in out[0]["service_intent"]
+    assert "brake_service" in out[1]["service_intent"]
+    assert "battery" in out[2]["service_intent"]
+    assert out[0] == out[4]
+
+def test_stream_cli_resumes_after_last_complete_line(tmp_path):
+    """JSONL mode writes one line per note and resumes after a torn write."""
+    from src.main import _run_cli_stream
+    src_path, out_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    notes = ["2018 Camry oil change", {"message": "Brake noise on 2015 Accord"}, "Battery dead", "Tire rotation"]
+    src_path.write_text("\n".join(json.dumps(n) for n in notes) + "\n")
+
+    assert asyncio.run(_run_cli_stream(str(src_path), str(out_path), 2, 1, resume=False)) == 4
+    lines = out_path.read_text().splitlines()
+    assert [json.loads(l)["_input_idx"] for l in lines] == [0, 1, 2, 3]
+
+    # Simulate a crash after two items plus half a line, then resume
+    out_path.write_text("\n".join(lines[:2]) + "\n" + lines[2][:10])
+    assert asyncio.run(_run_cli_stream(str(src_path), str(out_path), 1, 1, resume=True)) == 2
+    assert [json.loads(l)["_input_idx"] for l in out_path.read_text().splitlines()] == [0, 1, 2, 3]
+
+    # --resume with a {'messages': [...]} JSON input streams it the same way
+    json_path = tmp_path / "in.json"
+    json_path.write_text(json.dumps({"messages": [n if isinstance(n, str) else n["message"] for n in notes]}))
+    out_path.write_text("\n".join(lines[:3]) + "\n")
+    assert asyncio.run(_run_cli_stream(str(json_path), str(out_path), 1, 1, resume=True)) == 1
+    assert [json.loads(l)["_input_idx"] for l in out_path.read_text().splitlines()] == [0, 1, 2, 3]
+
+def test_analyze_stream_endpoint():
+    """The NDJSON endpoint emits one result per note in order."""
+    from fastapi.testclient import TestClient
+    from src.main import app
+    with TestClient(app) as client:
+        resp = client.post("/analyze/stream", json={"messages": ["oil change", "brake noise"], "concurrency": 2})
+    assert resp.status_code == 200
+    rows = [json.loads(l) for l in resp.text.splitlines()]
+    assert [r["_input_idx"] for r in rows] == [0, 1]
+
+def test_log_writer_batches_and_rotates(tmp_path):
+    """The queue-backed sink writes every event as JSONL and rotates by size."""
+    from src.logsink import JsonlLogWriter
+    path = tmp_path / "logs" / "pipeline.jsonl"
+    writer = JsonlLogWriter(str(path), max_bytes=2000, backup_count=2)
+    for batch in range(5):
+        for i in range(40):
+            writer.emit({"timestamp": "t", "event_type": "extraction_start", "input_idx": i})
+        writer.flush()
+    writer.close()
+    files = sorted(tmp_path.joinpath("logs").iterdir())
+    assert [f.name for f in files] == ["pipeline.jsonl", "pipeline.jsonl.1", "pipeline.jsonl.2"]
+    assert all(json.loads(l)["event_type"] == "extraction_start"
+               for f in files for l in f.read_text().splitlines())
+
+def test_log_writer_survives_write_errors(tmp_path, capsys):
+    """An unwritable path drops events with one stderr report; flush and close never hang."""
+    import threading, time
+    from src.logsink import JsonlLogWriter
+    (tmp_path / "file").write_text("")
+    writer = JsonlLogWriter(str(tmp_path / "file" / "pipeline.jsonl"))
+    for i in range(3):
+        writer.emit({"event_type": "x", "i": i})
+        assert writer.flush(timeout=2.0)
+    assert writer.dropped == 3 and writer.error is not None
+    assert capsys.readouterr().err.count("cannot write") == 1
+    writer.close()
+
+    # A stuck writer thread with a full queue: flush times out and close returns
+    gate = threading.Event()
+    stalled = JsonlLogWriter(str(tmp_path / "ok.jsonl"), max_queue=1)
+    write = stalled._write
+    stalled._write = lambda f, batch: gate.wait() and write(f, batch)
+    stalled.emit({"event_type": "first"})
+    while not stalled._queue.empty():
+        time.sleep(0.01)
+    stalled.emit({"event_type": "second"})
+    t0 = time.perf_counter()
+    assert not stalled.flush(timeout=0.1)
+    stalled.close(timeout=0.1)
+    assert time.perf_counter() - t0 < 1.0
+    gate.set()
+    stalled._thread.join(timeout=2.0)
+    assert not stalled._thread.is_alive()
+    assert len((tmp_path / "ok.jsonl").read_text().splitlines()) == 2
+
+def test_matcher_single_scan():
+    """One scan yields intents, signals, vehicle and year for every consumer."""
+    from src.matcher import scan
+    sig = scan("2015 Accord: brake grinding, tire pressure low, check-engine on")
+    assert (sig.make, sig.model, sig.year) == ("Honda", "Accord", 2015)
+    assert sig.intents(tire_prefers="tire_pressure") == ["tire_pressure", "brake_service", "ac_service", "engine_diagnostic"]
+    assert sig.strong_signal and sig.calibration_signal and not sig.has("inspect")
+    assert scan("generic question").intents() == ["unknown"]
+
+def test_rule_first_cascade_skips_model():
+    """Fully covered notes are answered by rules; ambiguous ones escalate."""
+    from src.matcher import scan
+    from src.processing import rule_first_extract
+    obj = rule_first_extract("2018 Camry oil change")
+    assert obj["vehicle_make"] == "Toyota" and obj["year"] == 2018
+    assert obj["service_intent"] == ["oil_change"]
+    assert rule_first_extract("2018 Camry oil change and battery check") is None
+    assert rule_first_extract("oil change please") is None
+    assert rule_first_extract("oil change please", threshold=0.4) is not None
+    assert rule_first_extract("Camry oil change at 120000 miles") is None
+    assert rule_first_extract("RO 19234 Camry oil change") is None
+    assert scan("2018 Camry oil change, part 2000-118").year == 2018
+    assert rule_first_extract("Customer needs an oil change for the 2018 Toyota Camry.") is not None
+    # Anything the rules can't express escalates to the model
+    assert rule_first_extract("2018 Camry oil change and state inspection") is None
+    assert rule_first_extract("2018 Camry oil change, transmission slipping") is None
+    assert rule_first_extract("2018 Camry oil change ASAP") is None
+
+    out = asyncio.run(process_notes(["2018 Camry oil change", "customer has a question"]))
+    assert out[0]["_extraction_method"] == "rules"
+    assert out[1]["_extraction_method"] != "rules"
+
+def test_parse_model_json_repairs_common_failures():
+    """Fenced, chatty and bracket-truncated output is repaired; cuts inside a value are not."""
+    import pytest
+    from src.jsonparse import parse_model_json
+    assert parse_model_json('{"a": 1}') == ({"a": 1}, None)
+    assert parse_model_json('{"a": 1, "b": [1, 2]') == ({"a": 1, "b": [1, 2]}, "truncation")
+    assert parse_model_json('{"s": ["oil_change", "brake_service"') == ({"s": ["oil_change", "brake_service"]}, "truncation")
+    for cut in ('{"vehicle_model": "Cam', '{"year": 20', '{"a": 1, "b', '{"a": 1, "b": "x", "c"'):
+        with pytest.raises(json.JSONDecodeError):
+            parse_model_json(cut)
+    assert parse_model_json('```json\n{"a": {"b": "}"}}\n```') == ({"a": {"b": "}"}}, "fence")
+    assert parse_model_json('Sure! Here it is: [{"index": 0}] hope that helps') == ([{"index": 0}], "extract")
+    with pytest.raises(json.JSONDecodeError):
+        parse_model_json("no json here")
+
+def test_metrics_endpoint_exposes_stage_histograms(tmp_path, monkeypatch):
+    """/metrics serves Prometheus text, merged across worker snapshots."""
+    from fastapi.testclient import TestClient
+    from src.main import app
+    from src import metrics
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    # Another worker's snapshot left in the shared directory
+    (tmp_path / "999999.json").write_text(json.dumps({"bizzycar_extractions_total": {"fallback": 5.0}}))
+    with TestClient(app) as client:
+        client.post("/analyze", json={"messages": ["customer question about brakes"]})
+        body = client.get("/metrics").text
+    assert '# TYPE bizzycar_stage_seconds histogram' in body
+    assert 'bizzycar_stage_seconds_bucket{stage="redaction",le="+Inf"}' in body
+    assert 'bizzycar_stage_seconds_count{stage="validation"}' in body
+    local_fallbacks = metrics.EXTRACTIONS.values.get("fallback", 0)
+    assert f'bizzycar_extractions_total{{method="fallback"}} {int(local_fallbacks + 5)}' in body
+
+def test_circuit_breaker_states():
+    """Breaker opens on consecutive failures, probes after the timeout, then closes."""
+    from src.resilience import CircuitBreaker
+    now = [0.0]
+    changes = []
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=lambda: now[0],
+                             on_change=lambda a, b: changes.append(b))
+    breaker.record_failure(); breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    now[0] = 6.0
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow(), "only one probe while half-open"
+    breaker.record_success()
+    assert breaker.state == "closed" and changes == ["open", "half_open", "closed"]
+
+def test_open_breaker_and_retry_budget_short_circuit_to_fallback(monkeypatch):
+    """A failing endpoint opens the breaker; later notes skip the model entirely."""
+    import src.processing as processing
+    from src.cache import reset_cache
+    from src.resilience import reset_resilience, get_retry_budget
+    monkeypatch.setenv("BREAKER_FAILURE_THRESHOLD", "2")
+    reset_resilience(); reset_cache()
+    calls = []
+
+    class Down:
+        async def extract(self, text):
+            calls.append(text)
+            raise Exception("503")
+
+    async def down_client():
+        return Down()
+
+    monkeypatch.setattr(processing, "get_client", down_client)
+    out = asyncio.run(process_notes([f"customer question {i}" for i in range(6)]))
+    assert all(r["_extraction_method"] == "fallback" for r in out)
+    assert len(calls) == 2
+    assert processing.model_breaker().state == "open"
+
+    budget = get_retry_budget()
+    budget.tokens = 0
+    assert not budget.try_spend() and budget.denied == 1
+    reset_resilience()
+
+def test_retry_budget_only_gates_endpoint_failures(monkeypatch):
+    """Bad answers retry without budget; endpoint failures spend it; batched successes deposit."""
+    import src.processing as processing
+    from src.cache import reset_cache
+    from src.resilience import reset_resilience, get_retry_budget
+    reset_resilience(); reset_cache()
+    attempts = {}
+
+    class Flaky:
+        async def extract(self, text):
+            attempts[text] = attempts.get(text, 0) + 1
+            if text.startswith("down"):
+                raise Exception("502 bad gateway")
+            intents = ["oil_change"] + (["inspection"] if attempts[text] == 1 else [])
+            return json.dumps({"vin_detected": False, "vehicle_make": "Toyota", "vehicle_model": "Camry",
+                               "year": 2018, "service_intent": intents, "urgency": "medium",
+                               "raw_extraction_confidence": 0.8, "notes": None})
+
+        async def extract_batch(self, texts):
+            return json.dumps([{"index": i, **json.loads(await self.extract(t))}
+                               for i, t in enumerate(texts)])
+
+    async def flaky_client():
+        return Flaky()
+
+    monkeypatch.setattr(processing, "get_client", flaky_client)
+    monkeypatch.setattr(processing, "RULE_FIRST_THRESHOLD", 2.0)
+    get_retry_budget().tokens = 0
+    out = asyncio.run(process_notes([f"2018 Camry oil change, visit {i}" for i in range(5)]))
+    assert all(r["_extraction_method"] == "model" for r in out)
+    assert get_retry_budget().denied == 0
+
+    budget = get_retry_budget()
+    budget.tokens = 0
+    out = asyncio.run(process_notes(["down: 2018 Camry oil change"]))
+    assert out[0]["_extraction_method"] == "fallback" and attempts["down: 2018 Camry oil change"] == 1
+    assert budget.denied == 1
+
+    before = budget.tokens
+    asyncio.run(processing.extract_batch(["2018 Camry oil change, visit 0", "2018 Camry oil change, visit 1"]))
+    assert budget.tokens == pytest.approx(before + 2 * budget.ratio)
+    reset_resilience(); reset_cache()
+
+def test_scheduler_coalesces_concurrent_requests(monkeypatch):
+    """Notes from concurrent callers share one dispatch and come back to the right caller."""
+    import src.scheduler as scheduler_mod
+    from src.scheduler import BatchScheduler
+    dispatched = []
+    real = scheduler_mod.process_notes
+
+    async def spy(notes, **kwargs):
+        dispatched.append(list(notes))
+        return await real(notes, **kwargs)
+
+    monkeypatch.setattr(scheduler_mod, "process_notes", spy)
+
+    async def run():
+        sched = BatchScheduler(window=0.05, max_batch=10)
+        sched.start()
+        try:
+            a, b = await asyncio.gather(sched.submit(["Battery dead on F-150."]),
+                                        sched.submit(["Brake noise on Accord.", "tire rotation"]))
+            # A caller that gives up before dispatch is dropped from the batch
+            late = asyncio.ensure_future(sched.submit(["oil leak"], timeout=0.001))
+            try:
+                await late
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(0.1)
+        finally:
+            await sched.stop()
+        return a, b
+
+    a, b = asyncio.run(run())
+    assert dispatched[0] == ["Battery dead on F-150.", "Brake noise on Accord.", "tire rotation"]
+    assert len(dispatched) == 1
+    assert "battery" in a[0]["service_intent"]
+    assert "brake_service" in b[0]["service_intent"] and len(b) == 2
+
+def test_sharded_cli_merges_in_order_and_resumes(tmp_path, monkeypatch):
+    """--workers shards the input, skips finished shards on re-run and merges in order."""
+    import src.sharded as sharded
+    monkeypatch.chdir(tmp_path)
+    notes = [f"2018 Camry oil change #{i}" if i % 2 else f"brake noise {i}" for i in range(7)]
+    src_path = tmp_path / "in.json"
+    src_path.write_text(json.dumps({"messages": notes}))
+    out_path, work = tmp_path / "out.json", tmp_path / "work"
+
+    shards = sharded.write_shards(str(src_path), str(work), shard_size=3)
+    assert [s["count"] for s in shards] == [3, 3, 1]
+    # Pretend shard 0 finished in an earlier, interrupted run
+    sharded.run_shard(*sharded._shard_paths(str(work), 0), 0, 1, 1)
+    ran = []
+    real = sharded.run_shard
+    monkeypatch.setattr(sharded, "ProcessPoolExecutor", _InlinePool)
+    monkeypatch.setattr(sharded, "run_shard", lambda *a: ran.append(a[2]) or real(*a))
+
+    assert sharded.run_sharded(str(src_path), str(out_path), workers=2, shard_size=3,
+                               work_dir=str(work)) == 7
+    assert ran == [3, 6]
+    items = json.loads(out_path.read_text())["items"]
+    assert len(items) == 7
+    assert ["brake_service" in it["service_intent"] for it in items] == [i % 2 == 0 for i in range(7)]
+    assert not work.exists()
+
+class _InlinePool:
+    """Synchronous stand-in for ProcessPoolExecutor so the test stays in-process."""
+    def __init__(self, *args, **kwargs): ...
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+        fut = Future()
+        fut.set_result(fn(*args))
+        return fut
+
+def test_job_api_processes_in_background_and_resumes_after_restart(tmp_path, monkeypatch):
+    """POST /jobs queues work on SQLite; a job interrupted mid-way resumes from its last chunk."""
+    import time
+    import src.jobs as jobs
+    from fastapi.testclient import TestClient
+    from src.main import app
+    db = tmp_path / "jobs.db"
+    monkeypatch.setenv("JOBS_DB_PATH", str(db))
+    monkeypatch.setenv("JOBS_CHUNK_SIZE", "2")
+    notes = [f"2018 Camry oil change #{i}" if i % 2 else f"brake noise {i}" for i in range(5)]
+
+    # A previous process leased a job, committed one chunk, then died
+    store = jobs.JobStore(str(db), lease=0.0)
+    crashed = store.create(notes, concurrency=2)
+    store.claim()
+    store.save_results(crashed, 0, [{"resumed": False}] * 2)
+    store.close()
+
+    seen = []
+    real = jobs.process_notes
+
+    async def spy(texts, **kwargs):
+        seen.extend(texts)
+        return await real(texts, **kwargs)
+
+    monkeypatch.setattr(jobs, "process_notes", spy)
+
+    def wait(client, job_id):
+        for _ in range(100):
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in jobs.TERMINAL:
+                return job
+            time.sleep(0.05)
+        raise AssertionError(job)
+
+    with TestClient(app) as client:
+        assert wait(client, crashed)["done"] == 5
+        assert seen == notes[2:]
+        resp = client.post("/jobs", json={"messages": notes, "concurrency": 2})
+        assert resp.status_code == 202
+        job = wait(client, resp.json()["id"])
+        assert job["status"] == "succeeded" and job["progress"] == 1.0
+        page = client.get(f"/jobs/{job['id']}/results", params={"offset": 0, "limit": 3}).json()
+        assert [r["_input_idx"] for r in page["items"]] == [0, 1, 2] and page["next_offset"] == 3
+        assert client.get(f"/jobs/{job['id']}/results", params={"offset": 3}).json()["next_offset"] is None
+        upload = client.post("/jobs", content="\n".join(json.dumps(n) for n in notes[:2]),
+                             headers={"content-type": "application/x-ndjson"})
+        wait(client, upload.json()["id"])
+        rows = [json.loads(l) for l in client.get(f"/jobs/{upload.json()['id']}/results/stream").text.splitlines()]
+        assert [("brake_service" in r["service_intent"]) for r in rows] == [True, False]
+        assert client.get("/jobs/missing").status_code == 404
+
+        bad = client.post("/jobs", content='"ok"\n42\n', headers={"content-type": "application/x-ndjson"})
+        assert bad.status_code == 400 and "line 2" in bad.json()["detail"]
+
+        # Server-side paths only resolve inside JOBS_INPUT_DIR
+        inputs = tmp_path / "inputs"
+        inputs.mkdir()
+        (inputs / "notes.jsonl").write_text("\n".join(json.dumps(n) for n in notes[:2]))
+        assert client.post("/jobs", json={"path": "notes.jsonl"}).status_code == 403
+        monkeypatch.setenv("JOBS_INPUT_DIR", str(inputs))
+        assert client.post("/jobs", json={"path": str(db)}).status_code == 403
+        assert client.post("/jobs", json={"path": "../jobs.db"}).status_code == 403
+        assert wait(client, client.post("/jobs", json={"path": "notes.jsonl"}).json()["id"])["total"] == 2
+
+    # Ingest commits in chunks; a failed read leaves no rows behind
+    store = jobs.JobStore(str(tmp_path / "ingest.db"))
+    assert store.get(store.create((f"note {i}" for i in range(25)), chunk=10))["total"] == 25
+
+    def broken():
+        yield from ["a"] * 15
+        raise ValueError("line 16: bad")
+
+    with pytest.raises(ValueError):
+        store.create(broken(), chunk=10)
+    assert store._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 25
+    store.close()
+
+def test_single_pass_redaction_matches_legacy_and_reports_offsets():
+    """Redaction gives the old two-pass output, with offsets, in linear time on adversarial runs."""
+    import random, time
+    from src.redaction import Redaction, redact_with_spans
+    email = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+    phone = re.compile(r"\+?\d[\d\-\s]{7,}\d")
+    legacy = lambda t: phone.sub("<redacted_phone>", email.sub("<redacted_email>", t))
+    rng = random.Random(0)
+    samples = ["".join(rng.choice("ab.@1 -+_%co\t") for _ in range(rng.randint(0, 40))) for _ in range(5000)]
+    samples += ["a.b@c.d.com9", "x@y.c", "+1 555 123 4567 x", "555-1234", "j@x.io@y.uk 123456789"]
+    assert [redact(t) for t in samples] == [legacy(t) for t in samples]
+
+    text, spans = redact_with_spans("Email jo@ex.com or call +1-555-123-4567.")
+    assert text == "Email <redacted_email> or call <redacted_phone>."
+    assert spans == [Redaction(6, 15, "email"), Redaction(24, 39, "phone")]
+
+    # Linear, not quadratic: 8x longer adversarial runs take ~8x (not ~64x) as long.
+    # Absolute timings live in bench/bench_redaction.py.
+    def cost(n):
+        inputs = ("A1b2" * (n // 4), "a@" + "." * n, "12345678" + "-" * n)
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            for adversarial in inputs:
+                redact(adversarial)
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    assert cost(32000) / cost(4000) < 24
+
+def test_batch_validation_and_byte_serialization():
+    """One adapter call validates a batch (bad items -> None); outputs are encoded straight to bytes."""
+    from src.jsonparse import dumps
+    from src.validators import validate_extractions
+    good = {"service_intent": ["unknown"], "raw_extraction_confidence": 0.9}
+    out = validate_extractions([good, {"year": 1900}, {"service_intent": []}])
+    assert out[1] is None
+    (first, w1), (third, w3) = out[0], out[2]
+    assert first.raw_extraction_confidence == 0.5 and w1 == []
+    assert w3 == ["empty_service_intent"]
+    assert json.loads(dumps({"items": [first.model_dump()]}, indent=2)) == {"items": [first.model_dump()]}
+
+    from fastapi.testclient import TestClient
+    from src.main import app
+    with TestClient(app) as client:
+        resp = client.post("/analyze", json={"messages": ["oil change", "brake noise"], "batch_size": 2})
+    assert resp.headers["content-type"] == "application/json"
+    assert [it["_extraction_method"] for it in resp.json()["items"]] == ["model", "model"]
+
+def test_logstats_streams_rotated_logs_by_run(tmp_path, monkeypatch):
+    """Every record carries a run_id; the analyzer folds live + rotated/gzipped logs per run."""
+    import gzip
+    from src.logsink import close_writer
+    from src.logstats import Analyzer, expand_paths, iter_events
+    log = tmp_path / "pipeline.jsonl"
+    monkeypatch.setenv("PIPELINE_LOG_PATH", str(log))
+    close_writer()
+    try:
+        asyncio.run(process_notes(["oil change on 2018 Camry", "brake noise"]))
+        close_writer()
+        with open(log, "rb") as src, gzip.open(f"{log}.1.gz", "wb") as dst:
+            dst.write(src.read())
+        log.write_text("")
+        asyncio.run(process_notes(["battery dead", "tire rotation", "question about hours"], concurrency=3))
+    finally:
+        close_writer()
+
+    records = [json.loads(l) for l in log.read_text().splitlines()]
+    assert len({r["run_id"] for r in records}) == 1 and records[0]["run_id"]
+    paths = expand_paths([str(tmp_path)])
+    assert [os.path.basename(p) for p in paths] == ["pipeline.jsonl.1.gz", "pipeline.jsonl"]
+    analyzer = Analyzer()
+    for event in iter_events(paths):
+        analyzer.add(event)
+    report = analyzer.report()
+    assert (report["runs"], report["notes"], report["unfinished"]) == (2, 5, 0)
+    assert [r["notes"] for r in report["recent_runs"]] == [2, 3]
+    assert report["latency_ms"]["n"] == 5 and report["latency_ms"]["p50"] <= report["latency_ms"]["p99"]
+    assert report["intents"]["battery"]["count"] == 1
+
+    # Memory stays bounded: old runs fold into totals, finished runs drop stuck notes
+    bounded = Analyzer(keep_runs=2)
+    for run in range(5):
+        for kind, idx in (("extraction_start", 0), ("extraction_start", 1), ("extraction_complete", 0),
+                          ("cache_stats", None)):
+            bounded.add({"timestamp": f"2026-01-01T00:00:0{run}", "run_id": f"r{run}",
+                         "event_type": kind, "input_idx": idx, "method": "model"})
+    report = bounded.report()
+    assert len(bounded.runs) == 2 and not bounded._pending
+    assert (report["runs"], report["notes"], report["unfinished"]) == (5, 5, 5)
+    assert [r["run_id"] for r in report["recent_runs"]] == ["r3", "r4"]
+
+def test_rate_limit_controller_absorbs_429s_from_stub_provider(monkeypatch):
+    """429s from an OpenAI-compatible stub are retried after Retry-After and cut the limits."""
+    import httpx
+    import src.processing as processing
+    from bench.stub_llm import make_app
+    from src.cache import reset_cache
+    from src.model_client import RealAPIClient
+    from src.ratelimit import parse_retry_after, reset_rate_limiters
+    from src.resilience import reset_resilience
+    assert parse_retry_after({"retry-after-ms": "250", "retry-after": "1"}) == 0.25
+    assert parse_retry_after({"retry-after": "2"}) == 2.0
+    assert parse_retry_after({"retry-after": "Thu, 01 Jan 1970 00:00:00 GMT"}) == 0.0
+    monkeypatch.setenv("RATE_LIMIT_MODELS", "stub-model=6:200")
+    monkeypatch.setenv("RATE_LIMIT_INITIAL_RPS", "200")
+    reset_rate_limiters(); reset_resilience(); reset_cache()
+    stub = make_app(rps=100, concurrency=2, latency_ms=20)
+
+    async def run():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub")
+        client = RealAPIClient("k", "http://stub/v1", "stub-model", http_client=http)
+
+        async def stub_client():
+            return client
+
+        monkeypatch.setattr(processing, "get_client", stub_client)
+        try:
+            notes = [f"customer {i} says the car makes a noise when cold" for i in range(12)]
+            return await process_notes(notes, concurrency=8), client.limiter
+        finally:
+            await client.aclose()
+
+    out, limiter = asyncio.run(run())
+    assert all(r["_extraction_method"] == "model" for r in out)
+    assert stub.state.counts["rate_limited"] == limiter.throttled > 0
+    assert stub.state.counts["ok"] == 12 and limiter.limit <= 6 and not limiter.slow_start
+    reset_rate_limiters(); reset_resilience(); reset_cache()
+
+def test_aimd_retries_transient_errors_and_keeps_a_baseline_per_call_size():
+    """5xx / connection errors are retried like the SDK would; packed calls don't look slow."""
+    import httpx
+    from src.ratelimit import AIMDController
+    ctl = AIMDController("m", transient_backoff=0.0, initial_rps=50.0)
+    calls = []
+
+    def failing(*errors):
+        async def request():
+            calls.append(1)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return "ok"
+        return request
+
+    bad_gateway = httpx.HTTPStatusError("502", request=None, response=httpx.Response(502))
+    assert asyncio.run(ctl.call(failing(httpx.ConnectError("reset"), bad_gateway))) == "ok"
+    assert len(calls) == 3
+    calls.clear()
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(ctl.call(failing(*[httpx.ConnectError("down")] * 3)))
+    assert len(calls) == 3
+    calls.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(ctl.call(failing(ValueError("bad request"))))
+    assert len(calls) == 1
+
+    ctl = AIMDController("m", clock=lambda: 100.0)
+    limit = ctl.limit
+    for items, latency in [(1, 0.5), (8, 3.0), (1, 0.5), (8, 3.2)]:
+        ctl.in_flight += 1
+        ctl.release(0.0, latency=latency, items=items)
+    assert ctl.cut_at == -math.inf and ctl.limit > limit
+    ctl.in_flight += 1
+    ctl.release(0.0, latency=2.0, items=1)
+    assert ctl.cut_at == 100.0
+
+def test_cancelled_half_open_probe_frees_its_slot(monkeypatch):
+    """A probe cancelled mid-call must not leave the breaker stuck half-open."""
+    import src.processing as processing
+    from src.resilience import reset_resilience
+    monkeypatch.setenv("BREAKER_RESET_SECONDS", "0")
+    reset_resilience()
+    breaker = processing.model_breaker()
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == "open"
+
+    async def run():
+        task = asyncio.ensure_future(processing._guarded(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        assert breaker.state == "half_open" and breaker.probes_in_flight == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert breaker.probes_in_flight == 0 and breaker.allow()
+    reset_resilience()
+
+def test_cancelled_cache_owner_does_not_cancel_waiters():
+    """Cancelling the task computing a key leaves coalesced waiters to finish it themselves."""
+    from src.cache import ExtractionCache, LRUCache
+    cache = ExtractionCache(LRUCache(16, 0))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"service_intent": ["battery"]}
+
+    async def run():
+        owner = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.get_or_compute("k", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        return await asyncio.gather(owner, *waiters, return_exceptions=True)
+
+    owner, *waiters = asyncio.run(run())
+    assert isinstance(owner, asyncio.CancelledError)
+    assert waiters == [{"service_intent": ["battery"]}] * 2 and len(calls) == 2
+
+def test_job_runner_stop_requeues_running_job(tmp_path, monkeypatch):
+    """Stopping the runner mid-job puts the job back in the queue immediately."""
+    import src.jobs as jobs
+
+    async def slow(texts, concurrency=1, batch_size=1):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(jobs, "process_notes", slow)
+    store = jobs.JobStore(str(tmp_path / "jobs.db"), lease=30)
+    job_id = store.create(["battery dead"])
+
+    async def run():
+        runner = jobs.JobRunner(store, workers=1, poll=0.01)
+        runner.start()
+        while store.get(job_id)["status"] != "running":
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(run())
+    assert store.get(job_id)["status"] == "queued"
+    assert store.claim()["id"] == job_id
+    store.close()
+
+def test_job_lease_is_renewed_while_a_slow_chunk_runs(tmp_path, monkeypatch):
+    """A chunk slower than the lease is processed once, not re-claimed by another worker."""
+    import src.jobs as jobs
+    seen = []
+
+    async def slow(texts, concurrency=1, batch_size=1):
+        seen.extend(texts)
+        await asyncio.sleep(0.6)
+        return [{"service_intent": ["unknown"]} for _ in texts]
+
+    monkeypatch.setattr(jobs, "process_notes", slow)
+    store = jobs.JobStore(str(tmp_path / "jobs.db"), lease=0.2)
+    job_id = store.create(["a", "b", "c", "d"])
+
+    async def run():
+        runner = jobs.JobRunner(store, workers=2, chunk_size=2, poll=0.05)
+        runner.start()
+        while store.get(job_id)["status"] != "succeeded":
+            await asyncio.sleep(0.05)
+        await runner.stop()
+
+    asyncio.run(run())
+    assert seen == ["a", "b", "c", "d"]
+    store.close()
+
+def test_truncation_repair_requires_the_full_extraction(monkeypatch):
+    """A repaired object missing extraction fields is a bad-JSON retry, not a model result."""
+    import pytest
+    import src.processing as processing
+
+    class Cut:
+        async def extract(self, text):
+            return '{"vin_detected": false, "vehicle_make": "Toyota"'
+
+    async def cut_client():
+        return Cut()
+
+    monkeypatch.setattr(processing, "get_client", cut_client)
+    with pytest.raises(processing.ModelBadJSON):
+        asyncio.run(processing.call_model_with_prompt("Toyota making noise"))
+
+def test_scheduler_cancels_abandoned_dispatch_and_fails_callers_on_stop(monkeypatch):
+    """A dispatch nobody waits for is cancelled; stop() resolves callers still waiting."""
+    import pytest
+    import src.scheduler as scheduler_mod
+    from src.scheduler import BatchScheduler, SchedulerStopped
+    started, cancelled = [], []
+
+    async def slow(notes, **kwargs):
+        started.append(list(notes))
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(list(notes))
+            raise
+
+    monkeypatch.setattr(scheduler_mod, "process_notes", slow)
+
+    async def run():
+        sched = BatchScheduler(window=0.01)
+        sched.start()
+        with pytest.raises(asyncio.TimeoutError):
+            await sched.submit(["oil leak"], timeout=0.05)
+        await asyncio.sleep(0.01)
+        waiting = asyncio.ensure_future(sched.submit(["brake noise"]))
+        await asyncio.sleep(0.05)
+        await sched.stop()
+        with pytest.raises(SchedulerStopped):
+            await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(run())
+    assert started == [["oil leak"], ["brake noise"]]
+    assert cancelled == [["oil leak"], ["brake noise"]]
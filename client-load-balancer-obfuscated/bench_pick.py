@@ -0,0 +1,86 @@
+"""Picks per second as the endpoint count grows: original O(N * window) scoring
+versus the incremental stats + lazy heap in `main.EndpointClient`.
+
+Run:  python bench_pick.py
+"""
+from collections import deque
+import random
+import time
+
+from main import EndpointClient
+
+
+class StubServer:
+    """N endpoints with fixed per-endpoint latency and a 5% failure rate."""
+
+    def __init__(self, n: int, seed: int = 0):
+        rng = random.Random(seed)
+        self.endpoint_ids = list(range(1, n + 1))
+        self._latency = {eid: rng.uniform(10, 250) for eid in self.endpoint_ids}
+        self._rng = rng
+
+    def call(self, eid: int) -> tuple[bool, float]:
+        return self._rng.random() > 0.05, self._latency[eid]
+
+
+class LegacyClient:
+    """The original client, generalised from ids (1, 2, 3) to N endpoints."""
+
+    def __init__(self, server: StubServer):
+        self.endpoint_server = server
+        self.ids = server.endpoint_ids
+        self.stats = {i: {"recent_success": deque(maxlen=20), "recent_latency": deque(maxlen=20),
+                          "successes": 0, "failures": 0, "consecutive_failures": 0} for i in self.ids}
+
+    def get_score(self, eid: int) -> float:
+        s = self.stats[eid]
+        if s["consecutive_failures"] >= 3:
+            return 0.0
+        sr = sum(s["recent_success"]) / len(s["recent_success"]) if s["recent_success"] else 1.0
+        if s["recent_latency"]:
+            avg_lat = sum(s["recent_latency"]) / len(s["recent_latency"])
+            latency_score = max(0.0, min(1.0, (300 - avg_lat) / 300))
+        else:
+            latency_score = 1.0
+        return 0.4 * sr + 0.6 * latency_score
+
+    def pick_best_endpoint(self) -> int:
+        scores = {eid: self.get_score(eid) for eid in self.ids}
+        best = max(scores, key=scores.get)
+        return random.choice(self.ids) if scores[best] < 0.2 else best
+
+    def update_stats(self, eid: int, success: bool, latency: float) -> None:
+        s = self.stats[eid]
+        s["recent_success"].append(1 if success else 0)
+        s["recent_latency"].append(latency)
+        if success:
+            s["successes"] += 1
+            s["consecutive_failures"] = 0
+        else:
+            s["consecutive_failures"] += 1
+            s["failures"] += 1
+
+
+def picks_per_second(client, server: StubServer, seconds: float = 0.5) -> float:
+    n, deadline = 0, time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            eid = client.pick_best_endpoint()
+            success, latency = server.call(eid)
+            client.update_stats(eid, success, latency)
+        n += 100
+    return n / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    print(f"{'endpoints':>9} {'original picks/s':>17} {'incremental picks/s':>20} {'speedup':>8}")
+    for n in (3, 10, 100, 300, 1000):
+        server = StubServer(n)
+        old = picks_per_second(LegacyClient(server), server)
+        new = picks_per_second(EndpointClient(server), server)
+        print(f"{n:>9} {old:>17,.0f} {new:>20,.0f} {new / old:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,553 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from endpoints import EndpointServer
+import argparse
+import heapq
+import math
 import random
+import threading
+import time
 
 
-class EndpointClient:
-    def __init__(self, server: EndpointServer):
-        self.endpoint_server: EndpointServer = server
+# `EndpointServer.call` accepts ids 1-3 (ValueError outside that range); the
+# server has no public listing, so this is its documented surface.
+DEFAULT_ENDPOINT_IDS = (1, 2, 3)
 
-        self.stats = {
-            i: {
-                "recent_success": deque(maxlen=20),
-                "recent_latency": deque(maxlen=20),
-                "successes": 0,
-                "failures": 0,
-                "consecutive_failures": 0,
-            } for  i in (1, 2, 3)
-        }
 
-    def get_score(self, eid: int) -> float:
-        s = self.stats[eid]
+def discover_endpoints(server: EndpointServer) -> list[int]:
+    """Endpoint ids the server routes to: its public `endpoint_ids` if it has
+    one, else `DEFAULT_ENDPOINT_IDS`."""
+    return sorted(getattr(server, "endpoint_ids", None) or DEFAULT_ENDPOINT_IDS)
 
-        if s["consecutive_failures"] >= 3:
-            return 0.0
 
-        if s["recent_success"]:
-            sr = sum(s["recent_success"]) / len(s["recent_success"])
+class EndpointStats:
+    """Rolling window over the last `window` calls of one endpoint.
+
+    Success and latency sums are kept alongside the deques, so recording a
+    call and scoring the endpoint are both O(1).
+    """
+
+    __slots__ = ("recent_success", "recent_latency", "success_sum", "latency_sum",
+                 "successes", "failures", "consecutive_failures")
+
+    def __init__(self, window: int = 20):
+        self.recent_success: deque[int] = deque(maxlen=window)
+        self.recent_latency: deque[float] = deque(maxlen=window)
+        self.success_sum = 0
+        self.latency_sum = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    def record(self, success: bool, latency: float) -> None:
+        if len(self.recent_success) == self.recent_success.maxlen:
+            self.success_sum -= self.recent_success[0]
+            self.latency_sum -= self.recent_latency[0]
+        self.recent_success.append(1 if success else 0)
+        self.recent_latency.append(latency)
+        self.success_sum += 1 if success else 0
+        self.latency_sum += latency
+
+        if success:
+            self.successes += 1
+            self.consecutive_failures = 0
         else:
-            sr = 1.0
+            self.consecutive_failures += 1
+            self.failures += 1
+
+    def score(self) -> float:
+        if self.consecutive_failures >= 3:
+            return 0.0
 
-        if s["recent_latency"]:
-            avg_lat = sum(s["recent_latency"]) / len(s["recent_latency"])
+        n = len(self.recent_success)
+        sr = self.success_sum / n if n else 1.0
 
+        if n:
+            avg_lat = self.latency_sum / n
             latency_score = max(0.0, min(1.0, (300 - avg_lat) / 300))
         else:
             latency_score = 1.0
 
         #returning moving av weighted
         return 0.4 * sr + 0.6 * latency_score
-    def pick_best_endpoint(self) -> int:
-        scores = {eid: self.get_score(eid) for eid in (1, 2, 3)}
-        best = max(scores, key=scores.get)
 
-        if scores[best] < 0.2:
-            return random.choice([1, 2, 3])
 
+class _LazyHeap:
+    """Min-heap of per-endpoint keys where each update changes one key.
+
+    Updates push a versioned entry; `top` discards stale entries lazily and
+    the heap is rebuilt when they pile up. Ties go to the lowest id.
+    """
+
+    def __init__(self, keys: dict[int, float]):
+        self._version = {eid: 0 for eid in keys}
+        self._heap = [(key, eid, 0) for eid, key in keys.items()]
+        heapq.heapify(self._heap)
+
+    def set(self, eid: int, key: float) -> None:
+        version = self._version[eid] = self._version[eid] + 1
+        heapq.heappush(self._heap, (key, eid, version))
+        if len(self._heap) > 4 * len(self._version) + 64:
+            self._heap = [e for e in self._heap if e[2] == self._version[e[1]]]
+            heapq.heapify(self._heap)
+
+    def top(self, allowed: set[int] | None = None) -> tuple[float, int]:
+        heap = self._heap
+        while heap[0][2] != self._version[heap[0][1]]:
+            heapq.heappop(heap)
+        if allowed is None or heap[0][1] in allowed:
+            return heap[0][0], heap[0][1]
+        # Some endpoints are at their in-flight cap: best current entry among the rest.
+        key, eid, _ = min(e for e in heap if e[2] == self._version[e[1]] and e[1] in allowed)
+        return key, eid
+
+
+class RoutingStrategy(ABC):
+    """Chooses the endpoint for the next call.
+
+    Strategies read the client's shared `EndpointStats` and may keep their own
+    state, updated through `update` after every call. `in_flight` counts
+    outstanding calls per endpoint (always 0 at pick time in serial mode);
+    `pick` gets the endpoints still under their in-flight cap, or None when
+    all are.
+    """
+
+    name = "base"
+
+    def __init__(self, endpoint_ids: list[int], stats: dict[int, EndpointStats], rng=random):
+        self.endpoint_ids = endpoint_ids
+        self.stats = stats
+        self.rng = rng
+        self.in_flight = {eid: 0 for eid in endpoint_ids}
+
+    def candidates(self, available: set[int] | None) -> list[int]:
+        return self.endpoint_ids if available is None else [e for e in self.endpoint_ids if e in available]
+
+    @abstractmethod
+    def pick(self, available: set[int] | None = None) -> int:
+        """The endpoint for the next call, chosen from `available` when given."""
+
+    def dispatched(self, eid: int) -> None:
+        """A call to `eid` was just sent (`in_flight` already counts it)."""
+
+    def update(self, eid: int, success: bool, latency: float) -> None:
+        pass
+
+
+class ScoreStrategy(RoutingStrategy):
+    """The original heuristic: 0.4 * success rate + 0.6 * latency score (0 at >= 300 ms)
+    over the rolling window, zero after 3 consecutive failures, random below 0.2.
+    Concurrent calls divide the score by 1 + outstanding calls."""
+
+    name = "score"
+
+    def __init__(self, endpoint_ids, stats, rng=random):
+        super().__init__(endpoint_ids, stats, rng)
+        self._heap = _LazyHeap({eid: -stats[eid].score() for eid in endpoint_ids})
+
+    def _rekey(self, eid: int) -> None:
+        self._heap.set(eid, -self.stats[eid].score() / (1 + self.in_flight[eid]))
+
+    def pick(self, available=None) -> int:
+        neg_score, best = self._heap.top(available)
+        if -neg_score < 0.2:
+            return self.rng.choice(self.candidates(available))
         return best
-    def update_stats(self, eid: int, success: bool, latency: float):
-        s = self.stats[eid]
 
-        s["recent_success"].append(1 if success else 0)
-        s["recent_latency"].append(latency)
+    def dispatched(self, eid):
+        self._rekey(eid)
 
-        if success:
-            s["successes"] += 1
-            s["consecutive_failures"] = 0
-        else:
-            s["consecutive_failures"] += 1
-            s["failures"] += 1
+    def update(self, eid, success, latency):
+        self._rekey(eid)
+
+
+class PowerOfTwoStrategy(RoutingStrategy):
+    """Score two random endpoints and take the better one (O(1) per pick)."""
+
+    name = "p2c"
+
+    def pick(self, available=None) -> int:
+        ids = self.candidates(available)
+        if len(ids) < 2:
+            return ids[0]
+        a, b = self.rng.sample(ids, 2)
+        load = self.in_flight
+        return a if self.stats[a].score() / (1 + load[a]) >= self.stats[b].score() / (1 + load[b]) else b
+
+
+class LeastLatencyStrategy(RoutingStrategy):
+    """Lowest EWMA latency, counting a failure as `failure_penalty_ms`; untried endpoints go first.
+    Concurrent calls multiply the EWMA by 1 + outstanding calls."""
+
+    name = "ewma"
+
+    def __init__(self, endpoint_ids, stats, rng=random, alpha: float = 0.3, failure_penalty_ms: float = 1000.0):
+        super().__init__(endpoint_ids, stats, rng)
+        self.alpha = alpha
+        self.failure_penalty_ms = failure_penalty_ms
+        self.ewma: dict[int, float | None] = {eid: None for eid in endpoint_ids}
+        self._heap = _LazyHeap({eid: 0.0 for eid in endpoint_ids})
+
+    def _rekey(self, eid: int) -> None:
+        self._heap.set(eid, (self.ewma[eid] or 0.0) * (1 + self.in_flight[eid]))
+
+    def pick(self, available=None) -> int:
+        return self._heap.top(available)[1]
+
+    def dispatched(self, eid):
+        self._rekey(eid)
+
+    def update(self, eid, success, latency):
+        sample = latency if success else max(latency, self.failure_penalty_ms)
+        prev = self.ewma[eid]
+        self.ewma[eid] = sample if prev is None else self.alpha * sample + (1 - self.alpha) * prev
+        self._rekey(eid)
+
+
+class _BanditStrategy(RoutingStrategy):
+    """Shared state for the bandit strategies.
+
+    Reward is 0 for a failure and `1 - latency / latency_scale` (floored at 0)
+    for a success. Endpoint health changes over time, so pull counts and
+    reward sums are discounted by `gamma` per call made anywhere (lazily, from
+    the step each endpoint was last updated); idle endpoints drift back
+    towards being explored.
+    """
+
+    def __init__(self, endpoint_ids, stats, rng=random, gamma: float = 0.95, latency_scale: float = 300.0):
+        super().__init__(endpoint_ids, stats, rng)
+        self.gamma = gamma
+        self.latency_scale = latency_scale
+        self.t = 0
+        self.pulls = {eid: 0.0 for eid in endpoint_ids}
+        self.rewards = {eid: 0.0 for eid in endpoint_ids}
+        self.updated_at = {eid: 0 for eid in endpoint_ids}
+
+    def discounted(self, eid: int) -> tuple[float, float]:
+        f = self.gamma ** (self.t - self.updated_at[eid])
+        return self.pulls[eid] * f, self.rewards[eid] * f
 
-    def call(self, runs: int) -> None:
-        """Placeholder call implementation.
-        Replace this with an efficient strategy.
+    def update(self, eid, success, latency):
+        reward = max(0.0, 1.0 - latency / self.latency_scale) if success else 0.0
+        n, s = self.discounted(eid)
+        self.pulls[eid] = n + 1.0
+        self.rewards[eid] = s + reward
+        self.updated_at[eid] = self.t
+        self.t += 1
+
+
+class ThompsonStrategy(_BanditStrategy):
+    """Sample each endpoint's reward from Beta(1 + rewards, 1 + pulls - rewards); take the best draw."""
+
+    name = "thompson"
+
+    def pick(self, available=None) -> int:
+        ids = self.candidates(available)
+        best, best_draw = ids[0], -1.0
+        for eid in ids:
+            n, s = self.discounted(eid)
+            draw = self.rng.betavariate(1.0 + s, 1.0 + n - s)
+            if draw > best_draw:
+                best, best_draw = eid, draw
+        return best
+
+
+class UCB1Strategy(_BanditStrategy):
+    """Discounted UCB1: mean reward + c * sqrt(2 ln(total pulls) / pulls); untried endpoints first."""
+
+    name = "ucb1"
+
+    def __init__(self, endpoint_ids, stats, rng=random, c: float = 0.5, **kwargs):
+        super().__init__(endpoint_ids, stats, rng, **kwargs)
+        self.c = c
+
+    def pick(self, available=None) -> int:
+        arms = [(eid, *self.discounted(eid)) for eid in self.candidates(available)]
+        total = sum(n for _, n, _ in arms)
+        best, best_value = arms[0][0], -math.inf
+        for eid, n, s in arms:
+            if n < 1e-9:
+                return eid
+            value = s / n + self.c * math.sqrt(2.0 * math.log(max(total, 1.0)) / n)
+            if value > best_value:
+                best, best_value = eid, value
+        return best
+
+
+STRATEGIES: dict[str, type[RoutingStrategy]] = {
+    cls.name: cls for cls in (ScoreStrategy, ThompsonStrategy, UCB1Strategy, PowerOfTwoStrategy, LeastLatencyStrategy)
+}
+
+
+class CircuitBreaker:
+    """Closed -> open -> half-open breaker for one endpoint, timed in calls.
+
+    Opens after `threshold` consecutive failures. Once `cooldown` more calls
+    have been made it is due one probe (half-open): success closes it, failure
+    reopens it with the cooldown doubled, up to `max_cooldown`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+    __slots__ = ("threshold", "base_cooldown", "max_cooldown", "cooldown", "state", "retry_at")
+
+    def __init__(self, threshold: int = 3, cooldown: int = 50, max_cooldown: int = 800):
+        self.threshold = threshold
+        self.base_cooldown = self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.retry_at = 0
+
+    def probe_due(self, now: int) -> bool:
+        return self.state == self.OPEN and now >= self.retry_at
+
+    def dispatched(self) -> None:
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+
+    def record(self, success: bool, consecutive_failures: int, now: int) -> None:
+        if self.state == self.HALF_OPEN:
+            if success:
+                self.state, self.cooldown = self.CLOSED, self.base_cooldown
+            else:
+                self.cooldown = min(2 * self.cooldown, self.max_cooldown)
+                self.state, self.retry_at = self.OPEN, now + self.cooldown
+        elif self.state == self.CLOSED and consecutive_failures >= self.threshold:
+            self.state, self.retry_at = self.OPEN, now + self.cooldown
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100.0 * len(ordered)) - 1)]
+
+
+class EndpointClient:
+    """Routes calls with a `RoutingStrategy`.
+
+    Optional extras: `breaker_cooldown` gives every endpoint a `CircuitBreaker`
+    (open endpoints are skipped until their probe is due), and `hedge_percentile`
+    fires a second call to the next-best endpoint when a call is still running
+    at that percentile of its endpoint's recent latencies. The client keeps
+    what the caller observed per request in `observed`; with hedging the
+    server sees more calls than that.
+    """
+
+    def __init__(self, server: EndpointServer, strategy: str | type[RoutingStrategy] = "score",
+                 endpoint_ids: list[int] | None = None, window: int = 20, seed: int | None = None,
+                 breaker_cooldown: int | None = None, hedge_percentile: float | None = None,
+                 hedge_min_samples: int = 5, **strategy_options):
+        self.endpoint_server: EndpointServer = server
+        self.endpoint_ids = list(endpoint_ids) if endpoint_ids is not None else discover_endpoints(server)
+
+        self.stats = {eid: EndpointStats(window) for eid in self.endpoint_ids}
+        rng = random.Random(seed) if seed is not None else random
+        cls = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+        self.strategy = cls(self.endpoint_ids, self.stats, rng, **strategy_options)
+        self.in_flight = self.strategy.in_flight
+        self._cond = threading.Condition()
+
+        self.breakers = ({eid: CircuitBreaker(cooldown=breaker_cooldown) for eid in self.endpoint_ids}
+                         if breaker_cooldown else {})
+        self._tripped: dict[int, CircuitBreaker] = {}  # open or half-open
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.clock = 0  # calls sent to the server, the breakers' time base
+        self.hedges = 0
+        self.observed: list[tuple[bool, float]] = []
+
+    def get_score(self, eid: int) -> float:
+        return self.stats[eid].score()
+
+    def pick_best_endpoint(self, available: set[int] | None = None) -> int:
+        return self.strategy.pick(available)
+
+    def update_stats(self, eid: int, success: bool, latency: float) -> None:
+        stats = self.stats[eid]
+        stats.record(success, latency)
+        self.strategy.update(eid, success, latency)
+        breaker = self.breakers.get(eid)
+        if breaker is not None:
+            breaker.record(success, stats.consecutive_failures, self.clock)
+            if breaker.state == CircuitBreaker.CLOSED:
+                self._tripped.pop(eid, None)
+            else:
+                self._tripped[eid] = breaker
+
+    def summary(self) -> dict[str, float]:
+        """Client-side view of the requests made: hedged requests count once, at
+        the latency of whichever call answered first."""
+        n = len(self.observed)
+        latencies = [latency for _, latency in self.observed]
+        return {
+            "total_calls": n,
+            "success_rate": sum(ok for ok, _ in self.observed) / n if n else 0.0,
+            "average_latency_ms": sum(latencies) / n if n else 0.0,
+            "p95_latency_ms": percentile(latencies, 95) if n else 0.0,
+            "p99_latency_ms": percentile(latencies, 99) if n else 0.0,
+            "total_latency_ms": sum(latencies),
+            "hedges": self.hedges,
+        }
+
+    def _route(self, available: set[int] | None = None) -> int:
+        """Pick the next endpoint: a due breaker probe first, otherwise the strategy
+        over closed endpoints (all allowed ones, if every one is tripped)."""
+        if self._tripped:
+            blocked = set()
+            for eid, breaker in self._tripped.items():
+                if available is not None and eid not in available:
+                    continue
+                if breaker.probe_due(self.clock):
+                    return eid
+                blocked.add(eid)
+            allowed = (set(self.endpoint_ids) if available is None else available) - blocked
+            if allowed:
+                available = allowed
+        return self.pick_best_endpoint(available)
+
+    def _dispatch(self, eid: int) -> None:
+        breaker = self._tripped.get(eid)
+        if breaker is not None:
+            breaker.dispatched()
+
+    def _attempt(self, eid: int) -> tuple[bool, float, list[tuple[int, bool, float]]]:
+        """Call `eid`, hedging if it outlives its latency percentile.
+
+        Returns what the caller observes and the (endpoint, success, latency)
+        of every call made, for `update_stats`.
+        """
+        self.clock += 1
+        success, latency = self.endpoint_server.call(eid)
+        calls = [(eid, success, latency)]
+        recent = self.stats[eid].recent_latency
+        if self.hedge_percentile is None or len(recent) < self.hedge_min_samples:
+            return success, latency, calls
+        threshold = percentile(recent, self.hedge_percentile)
+        others = set(self.endpoint_ids) - {eid} - self._tripped.keys()
+        if latency <= threshold or not others:
+            return success, latency, calls
+        # Still running at `threshold`: fire the hedge then, take the first success.
+        alt = self.pick_best_endpoint(others)
+        self.clock += 1
+        self.hedges += 1
+        alt_success, alt_latency = self.endpoint_server.call(alt)
+        calls.append((alt, alt_success, alt_latency))
+        alt_done = threshold + alt_latency
+        if success and (not alt_success or latency <= alt_done):
+            return True, latency, calls
+        if alt_success:
+            return True, alt_done, calls
+        return False, max(latency, alt_done), calls
+
+    def _finish(self, success: bool, latency: float, calls: list[tuple[int, bool, float]]) -> None:
+        self.observed.append((success, latency))
+        for eid, ok, ms in calls:
+            self.update_stats(eid, ok, ms)
+
+    def call(self, runs: int, concurrency: int = 1, max_in_flight_per_endpoint: int | None = None,
+             time_scale: float = 0.0) -> None:
+        """Make `runs` calls, one at a time or up to `concurrency` at once.
+
+        `EndpointServer.call` returns a simulated latency without waiting;
+        with `time_scale` > 0 each call also sleeps latency * time_scale so
+        wall-clock throughput reflects it.
         """
+        if concurrency > 1:
+            self._call_concurrent(runs, concurrency, max_in_flight_per_endpoint, time_scale)
+            return
         for i in range(runs):
-            eid = self.pick_best_endpoint()
-            success, latency_ms = self.endpoint_server.call(eid)
-            self.update_stats(eid, success, latency_ms)
+            eid = self._route()
+            self._dispatch(eid)
+            success, latency_ms, calls = self._attempt(eid)
+            if time_scale:
+                time.sleep(latency_ms / 1000.0 * time_scale)
+            self._finish(success, latency_ms, calls)
+
+    def _call_concurrent(self, runs: int, concurrency: int, cap: int | None, time_scale: float) -> None:
+        """Thread-pool mode: the dispatcher waits for a free global slot and an
+        endpoint under `cap`, routes with outstanding calls counted, and workers
+        record results. Stats, routing and the (non thread-safe) server share one lock;
+        hedge calls are not counted against the in-flight limits."""
+        cond = self._cond
+        in_flight = self.in_flight
+        state = {"outstanding": 0, "saturated": 0}
+
+        def release(eid: int) -> None:
+            if cap is not None and in_flight[eid] == cap:
+                state["saturated"] -= 1
+            in_flight[eid] -= 1
+            state["outstanding"] -= 1
+            cond.notify()
+
+        def worker(eid: int) -> None:
+            try:
+                with cond:
+                    success, latency_ms, calls = self._attempt(eid)
+                if time_scale:
+                    time.sleep(latency_ms / 1000.0 * time_scale)
+            except BaseException:
+                with cond:
+                    release(eid)
+                raise
+            with cond:
+                release(eid)
+                self._finish(success, latency_ms, calls)
+
+        def ready() -> bool:
+            return state["outstanding"] < concurrency and state["saturated"] < len(self.endpoint_ids)
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i in range(runs):
+                with cond:
+                    cond.wait_for(ready)
+                    available = None
+                    if state["saturated"]:
+                        available = {eid for eid in self.endpoint_ids if in_flight[eid] < cap}
+                    eid = self._route(available)
+                    self._dispatch(eid)
+                    in_flight[eid] += 1
+                    state["outstanding"] += 1
+                    if cap is not None and in_flight[eid] == cap:
+                        state["saturated"] += 1
+                    self.strategy.dispatched(eid)
+                futures.append(pool.submit(worker, eid))
+        for f in futures:
+            f.result()
 
 
 if __name__ == "__main__":
-    server = EndpointServer(test_case=1)
-    client = EndpointClient(server=server)
-    client.call(1_000)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="score")
+    parser.add_argument("--test-case", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=1_000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--mode", choices=["serial", "concurrent"], default="serial")
+    parser.add_argument("--concurrency", type=int, default=8, help="Global in-flight limit in concurrent mode")
+    parser.add_argument("--per-endpoint", type=int, help="In-flight cap per endpoint in concurrent mode")
+    parser.add_argument("--time-scale", type=float, default=0.0,
+                        help="Sleep latency * scale per call to emulate wire time (e.g. 0.01)")
+    parser.add_argument("--breaker-cooldown", type=int,
+                        help="Open an endpoint after 3 straight failures and probe it after this many calls")
+    parser.add_argument("--hedge-percentile", type=float,
+                        help="Hedge calls that outlive this percentile of their endpoint's recent latency")
+    args = parser.parse_args()
+
+    server = EndpointServer(test_case=args.test_case)
+    client = EndpointClient(server=server, strategy=args.strategy, seed=args.seed,
+                            breaker_cooldown=args.breaker_cooldown, hedge_percentile=args.hedge_percentile)
+    concurrency = args.concurrency if args.mode == "concurrent" else 1
+    t0 = time.perf_counter()
+    client.call(args.runs, concurrency=concurrency, max_in_flight_per_endpoint=args.per_endpoint,
+                time_scale=args.time_scale)
+    wall = time.perf_counter() - t0
     server.print_summary()
+    if client.hedges:
+        observed = client.summary()
+        print(f"client view: {observed['total_calls']} requests, {client.hedges} hedged, "
+              f"success {observed['success_rate']:.4f}, avg {observed['average_latency_ms']:.1f} ms, "
+              f"p95 {observed['p95_latency_ms']:.1f} ms, p99 {observed['p99_latency_ms']:.1f} ms")
+    print(f"{args.mode}: {args.runs} requests in {wall:.3f}s = {args.runs / wall:,.0f} req/s"
+          + (f" (concurrency {concurrency}, per-endpoint cap {args.per_endpoint})" if concurrency > 1 else ""))
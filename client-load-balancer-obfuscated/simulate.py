@@ -0,0 +1,94 @@
+"""Run every routing strategy against every EndpointServer scenario over many seeds.
+
+The server is deterministic per test case, so seeds only vary the strategies'
+own randomness (ties, exploration, sampling). Each strategy also runs with
+the client's circuit breakers and/or hedging (`--variants`). Results are the
+client-side metrics (a hedged request counts once), averaged per strategy,
+variant and scenario; `calls` is what the server actually received.
+
+Run:  python simulate.py --seeds 20 --runs 1000
+      python simulate.py --variants plain,both --breaker-cooldown 50 --hedge-percentile 90
+"""
+import argparse
+import contextlib
+import io
+import statistics
+
+from endpoints import EndpointServer
+from main import STRATEGIES, EndpointClient
+
+TEST_CASES = (0, 1)
+COLUMNS = ("total_latency_ms", "failures", "success_rate", "average_latency_ms", "p95_latency_ms",
+           "p99_latency_ms", "calls")
+VARIANTS = ("plain", "breaker", "hedge", "both")
+
+
+def variant_options(variant: str, breaker_cooldown: int = 50, hedge_percentile: float = 90.0) -> dict[str, object]:
+    return {"breaker_cooldown": breaker_cooldown if variant in ("breaker", "both") else None,
+            "hedge_percentile": hedge_percentile if variant in ("hedge", "both") else None}
+
+
+def run_once(strategy: str, test_case: int, seed: int, runs: int, **client_options) -> dict[str, float]:
+    server = EndpointServer(test_case=test_case)
+    client = EndpointClient(server, strategy=strategy, seed=seed, **client_options)
+    client.call(runs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        server_metrics = server.print_summary()
+    metrics = client.summary()
+    metrics["failures"] = round(metrics["total_calls"] * (1 - metrics["success_rate"]))
+    metrics["calls"] = server_metrics["total_calls"]
+    return metrics
+
+
+def simulate(strategies, test_cases=TEST_CASES, seeds: int = 20, runs: int = 1000, variants=("plain",),
+             breaker_cooldown: int = 50, hedge_percentile: float = 90.0,
+             **client_options) -> list[dict[str, object]]:
+    """One row per (test case, strategy, variant) with the mean and stdev of each metric over seeds."""
+    rows = []
+    for test_case in test_cases:
+        for strategy in strategies:
+            for variant in variants:
+                options = {**client_options, **variant_options(variant, breaker_cooldown, hedge_percentile)}
+                results = [run_once(strategy, test_case, seed, runs, **options) for seed in range(seeds)]
+                row: dict[str, object] = {"test_case": test_case, "strategy": strategy, "variant": variant}
+                for col in COLUMNS:
+                    values = [r[col] for r in results]
+                    row[col] = statistics.fmean(values)
+                    row[col + "_sd"] = statistics.pstdev(values)
+                rows.append(row)
+    return rows
+
+
+def print_table(rows: list[dict[str, object]]) -> None:
+    for test_case in sorted({r["test_case"] for r in rows}):
+        print(f"\ntest_case={test_case}")
+        print(f"{'strategy':<10} {'variant':<8} {'total latency ms':>20} {'failures':>14} {'success':>8} "
+              f"{'avg ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls':>7}")
+        for r in sorted((r for r in rows if r["test_case"] == test_case),
+                        key=lambda r: (r["failures"], r["total_latency_ms"])):
+            print(f"{r['strategy']:<10} {r['variant']:<8} {r['total_latency_ms']:>11,.0f} ±{r['total_latency_ms_sd']:>7,.0f} "
+                  f"{r['failures']:>6.1f} ±{r['failures_sd']:>5.1f} {r['success_rate']:>8.4f} "
+                  f"{r['average_latency_ms']:>8.1f} {r['p95_latency_ms']:>8.1f} {r['p99_latency_ms']:>8.1f} "
+                  f"{r['calls']:>7.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--test-cases", default=",".join(map(str, TEST_CASES)))
+    parser.add_argument("--seeds", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Subset of " + ",".join(VARIANTS))
+    parser.add_argument("--breaker-cooldown", type=int, default=50, help="Calls before an open endpoint is probed")
+    parser.add_argument("--hedge-percentile", type=float, default=90.0)
+    args = parser.parse_args()
+
+    rows = simulate(args.strategies.split(","), [int(t) for t in args.test_cases.split(",")],
+                    seeds=args.seeds, runs=args.runs, variants=args.variants.split(","),
+                    breaker_cooldown=args.breaker_cooldown, hedge_percentile=args.hedge_percentile)
+    print(f"{args.runs} calls per run, {args.seeds} seeds; rows sorted by failures, then total latency")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()